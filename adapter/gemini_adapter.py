@@ -7,9 +7,10 @@ import aiohttp
 
 from astrbot.api import logger
 
-from ..core.base_adapter import BaseImageAdapter
+from ..core.base_adapter import BaseImageAdapter, NonRetryableError
 from ..core.constants import GEMINI_DEFAULT_BASE_URL, GEMINI_SAFETY_CATEGORIES
 from ..core.types import GenerationRequest, ImageCapability
+from ..core.utils import encode_base64
 
 
 class GeminiAdapter(BaseImageAdapter):
@@ -64,16 +65,18 @@ class GeminiAdapter(BaseImageAdapter):
                     {"category": category, "threshold": self.safety_settings}
                 )
 
-        parts = [{"text": request.prompt}]
-        for image in request.images:
-            parts.append(
+        parts = [
+            {"text": request.prompt},
+            *[
                 {
                     "inline_data": {
                         "mime_type": image.mime_type,
-                        "data": base64.b64encode(image.data).decode("utf-8"),
+                        "data": encode_base64(image.data),
                     }
                 }
-            )
+                for image in request.images
+            ],
+        ]
 
         payload: dict = {
             "contents": [{"parts": parts}],
@@ -126,8 +129,13 @@ class GeminiAdapter(BaseImageAdapter):
                     logger.error(
                         f"{prefix} 错误 {response.status} (耗时: {duration:.2f}s): {preview}"
                     )
+                    self._raise_if_not_retryable(
+                        response.status, f"API 错误 ({response.status})"
+                    )
                     return None
-                return await response.json()
+                return await self._read_json(response)
+        except NonRetryableError:
+            raise
         except Exception as e:
             duration = time.time() - start_time
             logger.error(f"{prefix} 请求异常 (耗时: {duration:.2f}s): {e}")
@@ -9,9 +9,10 @@ import aiohttp
 
 from astrbot.api import logger
 
-from ..core.base_adapter import BaseImageAdapter
+from ..core.base_adapter import BaseImageAdapter, NonRetryableError
 from ..core.constants import GEMINI_DEFAULT_BASE_URL
 from ..core.types import GenerationRequest, ImageCapability
+from ..core.utils import to_data_url
 
 
 class GeminiOpenAIAdapter(BaseImageAdapter):
@@ -49,18 +50,13 @@ class GeminiOpenAIAdapter(BaseImageAdapter):
     def _build_payload(self, request: GenerationRequest) -> dict:
         """构建请求载荷。"""
         message_content: list[dict] = [
-            {"type": "text", "text": f"Generate an image: {request.prompt}"}
+            {"type": "text", "text": f"Generate an image: {request.prompt}"},
+            *[
+                {"type": "image_url", "image_url": {"url": to_data_url(image)}}
+                for image in request.images
+            ],
         ]
 
-        for image in request.images:
-            b64_data = base64.b64encode(image.data).decode("utf-8")
-            message_content.append(
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:{image.mime_type};base64,{b64_data}"},
-                }
-            )
-
         payload: dict[str, Any] = {
             "model": self.model,
             "messages": [{"role": "user", "content": message_content}],
@@ -123,8 +119,13 @@ class GeminiOpenAIAdapter(BaseImageAdapter):
                     logger.error(
                         f"{prefix} 错误 {response.status} (耗时: {duration:.2f}s): {preview}"
                     )
+                    self._raise_if_not_retryable(
+                        response.status, f"API 错误 ({response.status})"
+                    )
                     return None
-                return await response.json()
+                return await self._read_json(response)
+        except NonRetryableError:
+            raise
         except Exception as e:
             duration = time.time() - start_time
             logger.error(f"{prefix} 请求异常 (耗时: {duration:.2f}s): {e}")
@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-import base64
 import time
 from typing import Any
 
 from astrbot.api import logger
 
-from ..core.base_adapter import BaseImageAdapter
+from ..core.base_adapter import BaseImageAdapter, NonRetryableError
 from ..core.types import GenerationRequest, ImageCapability
+from ..core.utils import decode_base64, encode_base64
 
 
 class Jimeng2APIAdapter(BaseImageAdapter):
@@ -50,11 +50,17 @@ class Jimeng2APIAdapter(BaseImageAdapter):
                 url = f"{base_url.rstrip('/')}/v1/images/compositions"
                 headers["Content-Type"] = "application/json"
 
-                images_as_urls: list[str] = []
-                for img in request.images:
-                    mime = img.mime_type or "image/jpeg"
-                    b64 = base64.b64encode(img.data).decode("ascii")
-                    images_as_urls.append(f"data:{mime};base64,{b64}")
+                images_as_urls = [
+                    "".join(
+                        (
+                            "data:",
+                            img.mime_type or "image/jpeg",
+                            ";base64,",
+                            encode_base64(img.data),
+                        )
+                    )
+                    for img in request.images
+                ]
 
                 payload: dict[str, object] = {
                     "model": self.model or "jimeng-4.5",
@@ -82,9 +88,12 @@ class Jimeng2APIAdapter(BaseImageAdapter):
                         logger.error(
                             f"{prefix} Compositions 错误 ({resp.status}, 耗时: {duration:.2f}s): {error_text}"
                         )
+                        self._raise_if_not_retryable(
+                            resp.status, f"API 错误 ({resp.status})"
+                        )
                         return None, f"API 错误 ({resp.status})"
 
-                    data_json = await resp.json()
+                    data_json = await self._read_json(resp)
                     logger.debug(f"{prefix} Compositions 响应: {data_json}")
                     logger.info(f"{prefix} Compositions 成功 (耗时: {duration:.2f}s)")
                     return await self._extract_images(data_json, request.task_id)
@@ -119,13 +128,18 @@ class Jimeng2APIAdapter(BaseImageAdapter):
                         logger.error(
                             f"{prefix} Generations 错误 ({resp.status}, 耗时: {duration:.2f}s): {error_text}"
                         )
+                        self._raise_if_not_retryable(
+                            resp.status, f"API 错误 ({resp.status})"
+                        )
                         return None, f"API 错误 ({resp.status})"
 
-                    data_json = await resp.json()
+                    data_json = await self._read_json(resp)
                     logger.debug(f"{prefix} Generations 响应: {data_json}")
                     logger.info(f"{prefix} Generations 成功 (耗时: {duration:.2f}s)")
                     return await self._extract_images(data_json, request.task_id)
 
+        except NonRetryableError:
+            raise
         except Exception as e:
             duration = time.time() - start_time
             logger.error(f"{prefix} 请求异常 (耗时: {duration:.2f}s): {e}")
@@ -148,7 +162,7 @@ class Jimeng2APIAdapter(BaseImageAdapter):
         images = []
         for item in data:
             if "b64_json" in item:
-                images.append(base64.b64decode(item["b64_json"]))
+                images.append(decode_base64(item["b64_json"]))
             elif "url" in item:
                 async with self._get_session().get(
                     item["url"], proxy=self.proxy, timeout=self._get_download_timeout()
@@ -185,7 +199,7 @@ class Jimeng2APIAdapter(BaseImageAdapter):
                     proxy=self.proxy,
                     timeout=self._get_download_timeout(),
                 ) as resp:
-                    resp_json = await resp.json()
+                    resp_json = await self._read_json(resp)
                     status_code = resp.status
                     results[f"key_{i}"] = {"status": status_code, "data": resp_json}
                     if status_code == 200:
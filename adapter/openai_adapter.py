@@ -6,7 +6,7 @@ from typing import Any
 
 from astrbot.api import logger
 
-from ..core.base_adapter import BaseImageAdapter
+from ..core.base_adapter import BaseImageAdapter, NonRetryableError
 from ..core.types import GenerationRequest, ImageCapability
 
 
@@ -58,11 +58,16 @@ class OpenAIAdapter(BaseImageAdapter):
                     logger.error(
                         f"{prefix} API 错误 ({resp.status}, 耗时: {duration:.2f}s): {error_text}"
                     )
+                    self._raise_if_not_retryable(
+                        resp.status, f"API 错误 ({resp.status})"
+                    )
                     return None, f"API 错误 ({resp.status})"
 
-                data = await resp.json()
+                data = await self._read_json(resp)
                 logger.info(f"{prefix} 生成成功 (耗时: {duration:.2f}s)")
                 return await self._extract_images(data)
+        except NonRetryableError:
+            raise
         except Exception as e:
             duration = time.time() - start_time
             logger.error(f"{prefix} 请求异常 (耗时: {duration:.2f}s): {e}")
@@ -3,12 +3,13 @@ Core module for image generation plugin
 图像生成插件的核心模块
 """
 
-from .base_adapter import BaseImageAdapter
+from .base_adapter import BaseImageAdapter, NonRetryableError
 from .config_manager import (
     CacheSettings,
     ConfigManager,
     GenerationSettings,
     PluginConfig,
+    PresetEntry,
     UsageSettings,
 )
 from .constants import (
@@ -44,8 +45,13 @@ from .usage_manager import UsageManager
 from .utils import (
     convert_image_format,
     convert_images_batch,
+    decode_base64,
     detect_mime_type,
+    encode_base64,
+    json_dumps,
+    json_loads,
     mask_sensitive,
+    to_data_url,
     validate_aspect_ratio,
     validate_resolution,
 )
@@ -53,6 +59,7 @@ from .utils import (
 __all__ = [
     # 基类和核心组件
     "BaseImageAdapter",
+    "NonRetryableError",
     "ImageGenerator",
     "TaskManager",
     # 新增管理器
@@ -61,6 +68,7 @@ __all__ = [
     "ImageProcessor",
     # 配置数据类
     "PluginConfig",
+    "PresetEntry",
     "UsageSettings",
     "CacheSettings",
     "GenerationSettings",
@@ -78,8 +86,13 @@ __all__ = [
     # 工具函数
     "convert_image_format",
     "convert_images_batch",
+    "decode_base64",
     "detect_mime_type",
+    "encode_base64",
+    "json_dumps",
+    "json_loads",
     "mask_sensitive",
+    "to_data_url",
     "validate_aspect_ratio",
     "validate_resolution",
     # 常量
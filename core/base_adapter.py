@@ -2,14 +2,45 @@ from __future__ import annotations
 
 import abc
 import asyncio
+from typing import Any
 
 import aiohttp
 
 from astrbot.api import logger
 
-from .constants import DEFAULT_DOWNLOAD_TIMEOUT
+from .constants import (
+    AUTH_ERROR_STATUS,
+    DEFAULT_DOWNLOAD_TIMEOUT,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_LIMIT_PER_HOST,
+    NON_RETRYABLE_STATUS,
+)
 from .types import AdapterConfig, GenerationRequest, GenerationResult, ImageCapability
-from .utils import mask_sensitive
+from .utils import json_dumps, json_loads, mask_sensitive
+
+_SESSIONS: dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+"""按事件循环划分的共享 HTTP 会话，所有适配器复用同一个连接池。"""
+
+
+def get_shared_session() -> aiohttp.ClientSession:
+    """获取当前事件循环的共享 HTTP 会话，不存在时创建。"""
+    loop = asyncio.get_running_loop()
+    session = _SESSIONS.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=0,
+            limit_per_host=HTTP_LIMIT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        )
+        session = aiohttp.ClientSession(connector=connector, json_serialize=json_dumps)
+        _SESSIONS[loop] = session
+    return session
+
+
+class NonRetryableError(Exception):
+    """不应重试的请求错误，如请求参数错误或唯一的 API Key 鉴权失败。"""
 
 
 class BaseImageAdapter(abc.ABC):
@@ -18,6 +49,7 @@ class BaseImageAdapter(abc.ABC):
     def __init__(self, config: AdapterConfig):
         self.config = config
         self.api_keys = config.api_keys or []
+        self._key_count = len(self.api_keys)
         self.current_key_index = 0
         self.base_url = (config.base_url or "").rstrip("/")
         self.model = config.model
@@ -26,24 +58,34 @@ class BaseImageAdapter(abc.ABC):
         self.download_timeout = DEFAULT_DOWNLOAD_TIMEOUT
         self.max_retry_attempts = max(1, config.max_retry_attempts)
         self.safety_settings = config.safety_settings
-        self._session: aiohttp.ClientSession | None = None
 
     @abc.abstractmethod
     def get_capabilities(self) -> ImageCapability:
         """获取适配器支持的功能。"""
 
     async def close(self) -> None:
-        """关闭底层的 HTTP 会话。"""
+        """释放适配器资源。
 
-        if self._session and not self._session.closed:
-            await self._session.close()
-        self._session = None
+        HTTP 会话由所有适配器共享，此处不会关闭，统一由 `shutdown_all()` 释放。
+        """
+
+    @classmethod
+    async def shutdown_all(cls) -> None:
+        """关闭所有共享的 HTTP 会话，应在插件卸载时调用。"""
+        sessions = list(_SESSIONS.values())
+        _SESSIONS.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
 
     def _get_session(self) -> aiohttp.ClientSession:
-        """获取或创建 HTTP 会话。"""
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession()
-        return self._session
+        """获取当前事件循环的共享 HTTP 会话。"""
+        return get_shared_session()
+
+    @staticmethod
+    async def _read_json(response: aiohttp.ClientResponse) -> Any:
+        """读取并解析 JSON 响应体。"""
+        return json_loads(await response.read())
 
     def _get_current_api_key(self) -> str:
         """获取当前使用的 API Key。"""
@@ -73,12 +115,22 @@ class BaseImageAdapter(abc.ABC):
 
     def _rotate_api_key(self) -> None:
         """轮换 API Key。"""
-        if len(self.api_keys) > 1:
-            self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
+        if self._key_count > 1:
+            self.current_key_index = (self.current_key_index + 1) % self._key_count
             logger.info(
                 f"{self._get_log_prefix()} 轮换 API Key -> 索引 {self.current_key_index}"
             )
 
+    def _raise_if_not_retryable(self, status: int, error: str) -> None:
+        """HTTP 状态码表明重试无意义时抛出 `NonRetryableError`。
+
+        鉴权失败在配置了多个 API Key 时仍可轮换重试。
+        """
+        if status in NON_RETRYABLE_STATUS or (
+            status in AUTH_ERROR_STATUS and self._key_count == 1
+        ):
+            raise NonRetryableError(error)
+
     def update_model(self, model: str) -> None:
         """更新使用的模型。"""
         self.model = model
@@ -88,6 +140,7 @@ class BaseImageAdapter(abc.ABC):
 
         子类应重写 `_generate_once()` 方法来实现具体的生成逻辑。
         如需在生成前进行预处理验证，可重写 `_pre_generate()` 方法。
+        `_generate_once()` 抛出 `NonRetryableError` 时立即返回错误，不再重试。
         """
         if not self.api_keys:
             return GenerationResult(images=None, error="未配置 API Key")
@@ -104,7 +157,10 @@ class BaseImageAdapter(abc.ABC):
                     f"{self._get_log_prefix(request.task_id)} 重试 ({attempt + 1}/{self.max_retry_attempts})"
                 )
 
-            images, err = await self._generate_once(request)
+            try:
+                images, err = await self._generate_once(request)
+            except NonRetryableError as e:
+                return GenerationResult(images=None, error=str(e))
             if images is not None:
                 return GenerationResult(images=images, error=None)
 
@@ -112,9 +168,9 @@ class BaseImageAdapter(abc.ABC):
             if attempt < self.max_retry_attempts - 1:
                 self._rotate_api_key()
                 # 轮换 Key 时进行指数退避
-                if (attempt + 1) % max(1, len(self.api_keys)) == 0:
+                if (attempt + 1) % self._key_count == 0:
                     await asyncio.sleep(
-                        min(2 ** ((attempt + 1) // len(self.api_keys)), 10)
+                        min(2 ** ((attempt + 1) // self._key_count), 10)
                     )
 
         return GenerationResult(images=None, error=f"重试失败: {last_error}")
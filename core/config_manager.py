@@ -4,6 +4,7 @@
 
 from __future__ import annotations
 
+import json
 from dataclasses import dataclass, field
 from typing import Any
 
@@ -13,7 +14,7 @@ from astrbot.core.config.astrbot_config import AstrBotConfig
 from .types import AdapterConfig, AdapterType
 
 
-@dataclass
+@dataclass(slots=True)
 class UsageSettings:
     """用户使用限制设置。"""
 
@@ -23,7 +24,7 @@ class UsageSettings:
     max_image_size_mb: int = 10
 
 
-@dataclass
+@dataclass(slots=True)
 class CacheSettings:
     """缓存设置。"""
 
@@ -31,7 +32,7 @@ class CacheSettings:
     cleanup_interval_hours: int = 24
 
 
-@dataclass
+@dataclass(slots=True)
 class GenerationSettings:
     """生成设置。"""
 
@@ -42,7 +43,16 @@ class GenerationSettings:
     show_model_info: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
+class PresetEntry:
+    """预解析的预设，未指定的参数为 None。"""
+
+    prompt: str
+    aspect_ratio: str | None = None
+    resolution: str | None = None
+
+
+@dataclass(slots=True, kw_only=True)
 class PluginConfig:
     """完整的插件配置。"""
 
@@ -54,6 +64,10 @@ class PluginConfig:
     enable_llm_tool: bool = True
 
 
+_GENERATION_INFO_LINE = "✨ 生成成功！\n📊 耗时: {duration:.2f}s\n🖼️ 数量: {n}张"
+_DAILY_USAGE_LINE = "📅 今日用量: {count}/{limit}"
+
+
 class ConfigManager:
     """插件配置管理器。"""
 
@@ -61,6 +75,11 @@ class ConfigManager:
         self._config = config
         self._plugin_config: PluginConfig = PluginConfig()
         self._all_provider_configs: list[AdapterConfig] = []  # 保存所有供应商配置
+        self._presets_ci: dict[str, str] = {}  # 小写预设名 -> 原始预设名
+        self._preset_entries: dict[str, PresetEntry] = {}  # 预设名 -> 预解析的预设
+        self._model_info_line: str = ""  # 预先生成的模型信息文本
+        # 生成结果附加信息模板，按 (显示生成信息, 显示模型信息, 启用每日限制) 的位掩码索引
+        self._info_templates: tuple[str | None, ...] = (None,) * 8
         self.load()
 
     def load(self) -> PluginConfig:
@@ -72,8 +91,10 @@ class ConfigManager:
 
         self._plugin_config.enable_llm_tool = self._config.get("enable_llm_tool", True)
 
-        # 1. 收集所有供应商配置
+        # 1. 收集所有供应商配置，同时建立名称索引并汇总可用模型
         all_provider_configs: list[AdapterConfig] = []
+        provider_by_name: dict[str, AdapterConfig] = {}
+        all_available_models: list[str] = []
         for provider_item in api_providers_raw:
             if not isinstance(provider_item, dict):
                 continue
@@ -94,18 +115,21 @@ class ConfigManager:
             available_models = provider_item.get("available_models") or []
             proxy = (provider_item.get("proxy") or "").strip() or None
 
-            all_provider_configs.append(
-                AdapterConfig(
-                    type=adapter_type,
-                    name=name,
-                    base_url=self._clean_base_url(base_url),
-                    api_keys=api_keys,
-                    available_models=available_models,
-                    proxy=proxy,
-                    timeout=gen_cfg.get("timeout", 180),
-                    max_retry_attempts=gen_cfg.get("max_retry_attempts", 3),
-                )
+            provider_config = AdapterConfig(
+                type=adapter_type,
+                name=name,
+                base_url=self._clean_base_url(base_url),
+                api_keys=api_keys,
+                available_models=available_models,
+                proxy=proxy,
+                timeout=gen_cfg.get("timeout", 180),
+                max_retry_attempts=gen_cfg.get("max_retry_attempts", 3),
             )
+            all_provider_configs.append(provider_config)
+            # 同名供应商以第一个为准
+            provider_by_name.setdefault(name, provider_config)
+            # 汇总所有可用模型，供切换指令使用，格式为 "供应商名称/模型名称"
+            all_available_models.extend(f"{name}/{m}" for m in available_models)
 
         # 保存所有供应商配置供后续使用
         self._all_provider_configs = all_provider_configs
@@ -117,18 +141,11 @@ class ConfigManager:
         matched_config = None
         current_model = ""
 
-        if "/" in model_setting:
-            try:
-                target_provider_name, target_model = model_setting.split("/", 1)
-                for cfg in all_provider_configs:
-                    if cfg.name == target_provider_name:
-                        matched_config = cfg
-                        current_model = target_model
-                        break
-            except ValueError:
-                logger.warning(
-                    f"[ImageGen] 模型设置格式错误: {model_setting}，期望格式为 '供应商/模型'"
-                )
+        target_provider_name, sep, target_model = model_setting.partition("/")
+        if sep:
+            matched_config = provider_by_name.get(target_provider_name)
+            if matched_config:
+                current_model = target_model
 
         # 如果没匹配到（或者没设置），取第一个可用的
         if not matched_config and all_provider_configs:
@@ -145,14 +162,11 @@ class ConfigManager:
         if matched_config:
             self._plugin_config.adapter_config = matched_config
             self._plugin_config.adapter_config.model = current_model
-            # 将所有可用模型汇总，供切换指令使用，格式为 "供应商名称/模型名称"
-            all_available_models = []
-            for cfg in all_provider_configs:
-                for m in cfg.available_models:
-                    all_available_models.append(f"{cfg.name}/{m}")
             self._plugin_config.adapter_config.available_models = all_available_models
+            self._model_info_line = f"🤖 模型: {matched_config.name}/{current_model}"
         else:
             self._plugin_config.adapter_config = None
+            self._model_info_line = ""
             logger.error("[ImageGen] 未找到任何有效的生图模型配置")
 
         # 用户限制设置
@@ -182,6 +196,8 @@ class ConfigManager:
         self._plugin_config.presets = self._load_presets(
             self._config.get("presets", [])
         )
+        self._rebuild_preset_index()
+        self._build_info_templates()
 
         return self._plugin_config
 
@@ -211,6 +227,60 @@ class ConfigManager:
                     presets[name.strip()] = prompt.strip()
         return presets
 
+    def _build_info_templates(self) -> None:
+        """预先生成所有显示组合下的附加信息模板，发送时只需填充动态数值。"""
+        # 模型名称作为静态文本嵌入模板，需转义其中的花括号
+        model_line = self._model_info_line.replace("{", "{{").replace("}", "}}")
+        templates: list[str | None] = []
+        for mask in range(8):
+            parts = []
+            if mask & 4:
+                parts.append(_GENERATION_INFO_LINE)
+            if mask & 2 and model_line:
+                parts.append(model_line)
+            if mask & 1:
+                parts.append(_DAILY_USAGE_LINE)
+            templates.append("\n" + "\n".join(parts) if parts else None)
+        self._info_templates = tuple(templates)
+
+    def get_info_template(self, daily_limit_enabled: bool) -> str | None:
+        """获取生成结果附加信息模板，无需附加信息时返回 None。
+
+        模板占位符: `duration`（耗时秒数）、`n`（图片数量）、`count`（今日用量）、
+        `limit`（每日上限）。
+        """
+        settings = self._plugin_config.generation_settings
+        mask = (
+            (settings.show_generation_info << 2)
+            | (settings.show_model_info << 1)
+            | daily_limit_enabled
+        )
+        return self._info_templates[mask]
+
+    def _rebuild_preset_index(self) -> None:
+        """重建预设索引：忽略大小写的预设名映射（同名时保留先出现的预设）和预解析的预设。"""
+        self._presets_ci = {}
+        self._preset_entries = {}
+        for name, content in self._plugin_config.presets.items():
+            self._presets_ci.setdefault(name.lower(), name)
+            self._preset_entries[name] = self._parse_preset(content)
+
+    @staticmethod
+    def _parse_preset(content: Any) -> PresetEntry:
+        """解析预设内容，预设支持 JSON 格式配置高级参数。"""
+        if isinstance(content, str) and content.strip().startswith("{"):
+            try:
+                data = json.loads(content)
+            except json.JSONDecodeError:
+                return PresetEntry(prompt=content)
+            if isinstance(data, dict):
+                return PresetEntry(
+                    prompt=data.get("prompt", ""),
+                    aspect_ratio=data.get("aspect_ratio"),
+                    resolution=data.get("resolution"),
+                )
+        return PresetEntry(prompt=content)
+
     def save_model_setting(self, model: str) -> None:
         """保存模型设置。"""
         self._config.setdefault("generation", {})["model"] = model
@@ -219,6 +289,7 @@ class ConfigManager:
     def save_preset(self, name: str, content: str) -> None:
         """保存预设。"""
         self._plugin_config.presets[name] = content
+        self._rebuild_preset_index()
         self._config["presets"] = [
             f"{k}:{v}" for k, v in self._plugin_config.presets.items()
         ]
@@ -228,6 +299,7 @@ class ConfigManager:
         """删除预设，返回是否成功。"""
         if name in self._plugin_config.presets:
             del self._plugin_config.presets[name]
+            self._rebuild_preset_index()
             self._config["presets"] = [
                 f"{k}:{v}" for k, v in self._plugin_config.presets.items()
             ]
@@ -246,6 +318,15 @@ class ConfigManager:
         """获取预设字典。"""
         return self._plugin_config.presets
 
+    @property
+    def presets_ci(self) -> dict[str, str]:
+        """获取忽略大小写的预设名索引（小写名称 -> 原始名称）。"""
+        return self._presets_ci
+
+    def get_preset_entry(self, name: str) -> PresetEntry | None:
+        """获取预解析的预设。"""
+        return self._preset_entries.get(name)
+
     @property
     def enable_llm_tool(self) -> bool:
         """是否启用 LLM 工具。"""
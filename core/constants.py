@@ -31,6 +31,12 @@ DEFAULT_TIMEOUT = 180
 DEFAULT_DOWNLOAD_TIMEOUT = 30
 """默认图像下载超时时间（秒）。"""
 
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+"""流式下载图像时每次读取的块大小（字节）。"""
+
+CONVERT_CHUNK_SIZE = 8
+"""批量格式转换时每次提交到工作线程的图像数量。"""
+
 DEFAULT_MAX_RETRY_ATTEMPTS = 3
 """默认最大重试次数。"""
 
@@ -58,6 +64,25 @@ DEFAULT_DAILY_LIMIT_COUNT = 10
 DEFAULT_RATE_LIMIT_SECONDS = 0
 """默认用户请求频率限制（秒），0 表示不限制。"""
 
+# ========================== 重试策略 ==========================
+
+NON_RETRYABLE_STATUS = frozenset({400, 404, 422})
+"""请求本身有误、重试也不会成功的 HTTP 状态码。"""
+
+AUTH_ERROR_STATUS = frozenset({401, 403})
+"""鉴权失败的 HTTP 状态码，仅配置单个 API Key 时不再重试。"""
+
+# ========================== HTTP 连接池 ==========================
+
+HTTP_LIMIT_PER_HOST = 32
+"""共享 HTTP 会话中每个主机的最大连接数。"""
+
+HTTP_KEEPALIVE_TIMEOUT = 75
+"""共享 HTTP 会话中空闲连接的保活时间（秒）。"""
+
+HTTP_DNS_CACHE_TTL = 300
+"""共享 HTTP 会话的 DNS 缓存时间（秒）。"""
+
 # ========================== 脱敏常量 ==========================
 
 MASK_VISIBLE_CHARS = 4
@@ -74,6 +99,18 @@ MASK_PLACEHOLDER = "****"
 USAGE_DATA_RETENTION_DAYS = 7
 """使用数据保留天数。"""
 
+USAGE_FLUSH_INTERVAL_SECONDS = 5.0
+"""使用数据写入磁盘的间隔（秒）。"""
+
+USAGE_FLUSH_MAX_INTERVAL_SECONDS = 60.0
+"""无新数据时写盘检查间隔退避的上限（秒）。"""
+
+RATE_LIMIT_PURGE_INTERVAL_SECONDS = 300.0
+"""清理过期频率限制记录的间隔（秒）。"""
+
+MAX_PENDING_GENERATION_TASKS = 20
+"""排队等待执行的生图任务上限，超出时取消最早排队的任务。"""
+
 
 # ========================== 分辨率映射 ==========================
 
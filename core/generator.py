@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import dataclasses
+
 from astrbot.api import logger
 
 from ..adapter import (
@@ -9,15 +11,24 @@ from ..adapter import (
     OpenAIAdapter,
     ZImageAdapter,
 )
+from .base_adapter import BaseImageAdapter
 from .types import (
     AdapterConfig,
     AdapterType,
     GenerationRequest,
     GenerationResult,
-    ImageData,
 )
 from .utils import convert_images_batch
 
+_ADAPTER_MAP: dict[AdapterType, type[BaseImageAdapter]] = {
+    AdapterType.GEMINI: GeminiAdapter,
+    AdapterType.GEMINI_OPENAI: GeminiOpenAIAdapter,
+    AdapterType.OPENAI: OpenAIAdapter,
+    AdapterType.Z_IMAGE: ZImageAdapter,
+    AdapterType.JIMENG2API: Jimeng2APIAdapter,
+}
+"""适配器类型到适配器类的映射。"""
+
 
 class ImageGenerator:
     """适配器编排器，负责分发生图请求。"""
@@ -26,17 +37,9 @@ class ImageGenerator:
         self.adapter_config = adapter_config
         self.adapter = self._create_adapter(adapter_config)
 
-    def _create_adapter(self, config: AdapterConfig):
+    def _create_adapter(self, config: AdapterConfig) -> BaseImageAdapter:
         """根据配置创建对应的适配器。"""
-        adapter_map: dict[AdapterType, type] = {
-            AdapterType.GEMINI: GeminiAdapter,
-            AdapterType.GEMINI_OPENAI: GeminiOpenAIAdapter,
-            AdapterType.OPENAI: OpenAIAdapter,
-            AdapterType.Z_IMAGE: ZImageAdapter,
-            AdapterType.JIMENG2API: Jimeng2APIAdapter,
-        }
-
-        adapter_cls = adapter_map.get(config.type)
+        adapter_cls = _ADAPTER_MAP.get(config.type)
         if not adapter_cls:
             raise ValueError(f"不支持的适配器类型: {config.type}")
         return adapter_cls(config)
@@ -46,18 +49,11 @@ class ImageGenerator:
         if not self.adapter:
             return GenerationResult(images=None, error="适配器未初始化")
 
-        # 先将参考图批量转换成兼容格式，再调用下游适配器
-        converted_images: list[ImageData] = []
+        # 先将参考图批量转换成兼容格式，再调用下游适配器；无参考图时直接复用原请求
+        patched_request = request
         if request.images:
             converted_images = await convert_images_batch(request.images)
-
-        patched_request = GenerationRequest(
-            prompt=request.prompt,
-            images=converted_images,
-            aspect_ratio=request.aspect_ratio,
-            resolution=request.resolution,
-            task_id=request.task_id,
-        )
+            patched_request = dataclasses.replace(request, images=converted_images)
 
         try:
             return await self.adapter.generate(patched_request)
@@ -73,7 +69,8 @@ class ImageGenerator:
     async def update_adapter(self, adapter_config: AdapterConfig) -> None:
         """更新适配器配置并重新创建适配器。
 
-        注意: 此方法会关闭旧适配器以释放资源。
+        注意: 旧适配器会被直接丢弃，共享的 HTTP 会话不会关闭，
+        直到插件卸载时由 `shutdown_all()` 统一释放。
         """
         if self.adapter:
             await self.adapter.close()
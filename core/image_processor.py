@@ -4,23 +4,41 @@
 
 from __future__ import annotations
 
+import asyncio
 import hashlib
+import heapq
 import os
+import time
+from operator import itemgetter
 from typing import TYPE_CHECKING
 
+import aiohttp
+
 import astrbot.api.message_components as Comp
 from astrbot.api import logger
 from astrbot.core.utils.io import download_image_by_url
 
+from .base_adapter import get_shared_session
+from .constants import DEFAULT_DOWNLOAD_TIMEOUT, DOWNLOAD_CHUNK_SIZE
+from .utils import detect_mime_type
+
 if TYPE_CHECKING:
     from astrbot.api.event import AstrMessageEvent
 
 
+def _read_file(path: str) -> bytes:
+    """同步读取文件内容。"""
+    with open(path, "rb") as f:
+        return f.read()
+
+
 class ImageProcessor:
     """图片处理器 - 负责图片下载、提取和缓存管理。"""
 
     def __init__(self, cache_dir: str, max_image_size_mb: int, max_cache_count: int):
         self._cache_dir = cache_dir
+        self._gen_prefix = os.path.join(cache_dir, "gen_")  # 生成图片的路径前缀
+        self._url_hasher = hashlib.md5(usedforsecurity=False)  # 复制后计算缓存文件名
         self._max_image_size_mb = max_image_size_mb
         self._max_cache_count = max_cache_count
         self._ensure_cache_dir()
@@ -46,54 +64,89 @@ class ImageProcessor:
     async def download_image(self, url: str) -> tuple[bytes, str] | None:
         """下载图片并返回二进制数据和 MIME 类型。"""
         try:
-            data: bytes | None = None
             if os.path.exists(url) and os.path.isfile(url):
-                with open(url, "rb") as f:
-                    data = f.read()
+                data = await self._read_file_limited(url)
             else:
-                # 使用插件缓存目录
-                file_name = f"ref_{hashlib.md5(url.encode()).hexdigest()[:10]}"
-                path = os.path.join(self._cache_dir, file_name)
-                path = await download_image_by_url(url, path=path)
-                if path:
-                    with open(path, "rb") as f:
-                        data = f.read()
-
+                data = await self._download(url)
             if not data:
                 return None
 
-            if len(data) > self._max_image_size_mb * 1024 * 1024:
-                logger.warning(
-                    f"[ImageGen] 图片超过大小限制 ({self._max_image_size_mb}MB)"
-                )
-                return None
-
-            mime = self._detect_mime_type(data)
+            mime = detect_mime_type(data)
             return data, mime
         except Exception as exc:
             logger.error(f"[ImageGen] 获取图片失败 (URL/Path: {url}): {exc}")
         return None
 
-    def _detect_mime_type(self, data: bytes) -> str:
-        """检测图片 MIME 类型。"""
-        if data.startswith(b"\xff\xd8"):
-            return "image/jpeg"
-        elif data.startswith(b"GIF"):
-            return "image/gif"
-        elif data.startswith(b"RIFF") and b"WEBP" in data[:16]:
-            return "image/webp"
-        return "image/png"
+    async def _download(
+        self, url: str, fallback_file_name: str | None = None
+    ) -> bytes | None:
+        """下载远程图片，超过大小限制时返回 None。
+
+        HTTP(S) 地址通过共享会话直接读入内存，无需写盘后再读回；
+        其他地址或连接出错、超时（如共享会话未走环境代理、SSL 错误）时回退到
+        AstrBot 的下载工具，先保存到缓存目录下的 `fallback_file_name`，
+        未指定时按 URL 哈希命名。
+        """
+        if url.startswith(("http://", "https://")):
+            try:
+                return await self._fetch_to_memory(url)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.debug(
+                    f"[ImageGen] 直接下载失败，回退到 AstrBot 下载: {e}"
+                )
+
+        if fallback_file_name is None:
+            url_hash = self._url_hasher.copy()
+            url_hash.update(url.encode())
+            fallback_file_name = f"ref_{url_hash.hexdigest()[:10]}"
+        path = await download_image_by_url(
+            url, path=os.path.join(self._cache_dir, fallback_file_name)
+        )
+        if not path:
+            return None
+        return await self._read_file_limited(path)
+
+    async def _fetch_to_memory(self, url: str) -> bytes | None:
+        """通过共享会话下载图片到内存，超过大小限制时提前中止。"""
+        max_bytes = self._max_image_size_mb * 1024 * 1024
+        async with get_shared_session().get(
+            url, timeout=aiohttp.ClientTimeout(total=DEFAULT_DOWNLOAD_TIMEOUT)
+        ) as resp:
+            if resp.status != 200:
+                logger.warning(f"[ImageGen] 下载图片失败 ({resp.status}): {url}")
+                return None
+
+            # Content-Length 仅用于提前拒绝：启用压缩时它是压缩后的大小，
+            # 实际限制以解压后读到的字节数为准
+            if resp.content_length is not None and resp.content_length > max_bytes:
+                self._warn_oversize()
+                return None
+
+            buffer = bytearray()
+            async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                buffer += chunk
+                if len(buffer) > max_bytes:
+                    self._warn_oversize()
+                    return None
+            return bytes(buffer)
+
+    async def _read_file_limited(self, path: str) -> bytes | None:
+        """读取本地图片文件，读取前先检查大小以避免为超限图片分配内存。"""
+        if os.path.getsize(path) > self._max_image_size_mb * 1024 * 1024:
+            self._warn_oversize()
+            return None
+        return await asyncio.to_thread(_read_file, path)
+
+    def _warn_oversize(self) -> None:
+        """记录图片超过大小限制的警告。"""
+        logger.warning(f"[ImageGen] 图片超过大小限制 ({self._max_image_size_mb}MB)")
 
     async def get_avatar(self, user_id: str) -> bytes | None:
         """获取用户头像。"""
         url = f"https://q4.qlogo.cn/headimg_dl?dst_uin={user_id}&spec=640"
         try:
-            file_name = f"avatar_{user_id}.jpg"
-            path = os.path.join(self._cache_dir, file_name)
-            path = await download_image_by_url(url, path=path)
-            if path:
-                with open(path, "rb") as f:
-                    return f.read()
+            # 头像文件名按用户 ID 已唯一，无需哈希
+            return await self._download(url, f"avatar_{user_id}.jpg")
         except Exception as e:
             logger.debug(f"[ImageGen] 获取头像失败 (user_id={user_id}): {e}")
         return None
@@ -102,10 +155,44 @@ class ImageProcessor:
         self, event: AstrMessageEvent
     ) -> list[tuple[bytes, str]]:
         """从消息事件中提取图片（包括直接发送的图片、引用消息中的图片、被@用户的头像）。"""
+        return await self.fetch_images(self.collect_image_sources(event))
+
+    async def fetch_images(
+        self, sources: list[tuple[bool, str]]
+    ) -> list[tuple[bytes, str]]:
+        """下载 `collect_image_sources` 收集到的图片来源，失败的来源会被跳过。"""
+        if not sources:
+            return []
+
+        # 各图片相互独立，并发下载，结果保持消息中的原始顺序
+        results = await asyncio.gather(
+            *(
+                self.get_avatar(value) if is_avatar else self.download_image(value)
+                for is_avatar, value in sources
+            ),
+            return_exceptions=True,
+        )
+
         images_data: list[tuple[bytes, str]] = []
+        for (is_avatar, _), result in zip(sources, results):
+            if isinstance(result, BaseException):
+                logger.error(f"[ImageGen] 提取消息组件图片失败: {result}")
+            elif result and is_avatar:
+                images_data.append((result, detect_mime_type(result)))
+            elif result:
+                images_data.append(result)
+        return images_data
+
+    def collect_image_sources(self, event: AstrMessageEvent) -> list[tuple[bool, str]]:
+        """按消息顺序收集图片来源。
+
+        返回 `(is_avatar, value)` 列表：`is_avatar` 为 True 时 `value` 为需要获取头像的
+        用户 ID，否则为图片 URL 或本地路径。
+        """
+        sources: list[tuple[bool, str]] = []
 
         if not event.message_obj or not event.message_obj.message:
-            return images_data
+            return sources
 
         # 预扫描：记录引用消息的发送者以及各个 @ 出现次数，用于过滤自动 @
         reply_sender_id = None
@@ -124,17 +211,15 @@ class ImageProcessor:
             try:
                 if isinstance(component, Comp.Image):
                     # 处理直接发送的图片
-                    url = component.url or component.file
-                    if url and (data := await self.download_image(url)):
-                        images_data.append(data)
+                    if url := component.url or component.file:
+                        sources.append((False, url))
                 elif isinstance(component, Comp.Reply):
                     # 处理引用消息中的图片
                     if component.chain:
                         for sub_comp in component.chain:
                             if isinstance(sub_comp, Comp.Image):
-                                url = sub_comp.url or sub_comp.file
-                                if url and (data := await self.download_image(url)):
-                                    images_data.append(data)
+                                if url := sub_comp.url or sub_comp.file:
+                                    sources.append((False, url))
                 elif isinstance(component, Comp.At):
                     # 处理 @ 用户的头像
                     if hasattr(component, "qq") and component.qq != "all":
@@ -147,30 +232,33 @@ class ImageProcessor:
                         # 机器人单次被 @ 多为触发前缀，默认不取机器人头像
                         if self_id and uid == self_id and at_counts.get(uid, 0) == 1:
                             continue
-                        if avatar_data := await self.get_avatar(uid):
-                            images_data.append((avatar_data, "image/jpeg"))
+                        sources.append((True, uid))
             except Exception as e:
                 logger.error(f"[ImageGen] 提取消息组件图片失败: {e}")
                 continue
-        return images_data
+        return sources
 
     async def cleanup_cache(self) -> None:
         """执行缓存清理。"""
+        await asyncio.to_thread(self._cleanup_sync)
+
+    def _cleanup_sync(self) -> None:
+        """同步执行缓存清理，在工作线程中运行。"""
         if not os.path.exists(self._cache_dir):
             return
 
-        files = []
-        for f in os.listdir(self._cache_dir):
-            path = os.path.join(self._cache_dir, f)
-            if os.path.isfile(path):
-                files.append((path, os.path.getmtime(path)))
+        # scandir 的 DirEntry 自带 stat 缓存，单次遍历即可获得文件类型与修改时间
+        with os.scandir(self._cache_dir) as it:
+            files = [
+                (entry.path, entry.stat().st_mtime)
+                for entry in it
+                if entry.is_file(follow_symlinks=False)
+            ]
 
-        # 按修改时间排序（旧的在前）
-        files.sort(key=lambda x: x[1])
-
-        # 按数量清理
-        if len(files) > self._max_cache_count:
-            to_delete = files[: len(files) - self._max_cache_count]
+        # 按数量清理，只挑选最旧的若干文件，无需整体排序
+        excess = len(files) - self._max_cache_count
+        if excess > 0:
+            to_delete = heapq.nsmallest(excess, files, key=itemgetter(1))
             deleted_count = 0
             for path, _ in to_delete:
                 try:
@@ -182,16 +270,25 @@ class ImageProcessor:
                 f"[ImageGen] 已清理 {deleted_count}/{len(to_delete)} 个旧缓存文件 (按数量)"
             )
 
-    def save_generated_image(self, task_id: str, img_bytes: bytes) -> str | None:
+    async def save_generated_image(self, task_id: str, img_bytes: bytes) -> str | None:
         """保存生成的图片到缓存目录，返回文件路径。"""
         try:
-            import time
-
-            file_name = f"gen_{task_id}_{int(time.time())}_{hashlib.md5(img_bytes).hexdigest()[:6]}.png"
-            file_path = os.path.join(self._cache_dir, file_name)
-            with open(file_path, "wb") as f:
-                f.write(img_bytes)
-            return file_path
+            return await asyncio.to_thread(self._save_sync, task_id, img_bytes)
         except Exception as exc:
             logger.error(f"[ImageGen] 保存图片失败: {exc}")
             return None
+
+    def _save_sync(self, task_id: str, img_bytes: bytes) -> str:
+        """同步写入图片文件，在工作线程中运行。"""
+        img_hash = hashlib.md5(img_bytes, usedforsecurity=False).hexdigest()[:6]
+        timestamp = time.time_ns() // 1_000_000_000
+        file_path = f"{self._gen_prefix}{task_id}_{timestamp}_{img_hash}.png"
+        # 直接使用 os.write 写入，绕过 Python 的缓冲 I/O 层
+        fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            view = memoryview(img_bytes)
+            while view:
+                view = view[os.write(fd, view) :]
+        finally:
+            os.close(fd)
+        return file_path
@@ -4,8 +4,6 @@ LLM 可调用的图像生成工具模块
 
 from __future__ import annotations
 
-import hashlib
-import time
 from typing import TYPE_CHECKING, Any
 
 from pydantic import Field
@@ -17,6 +15,7 @@ from astrbot.core.agent.tool import FunctionTool, ToolExecResult
 from astrbot.core.astr_agent_context import AstrAgentContext
 
 from .types import ImageCapability
+from .utils import detect_mime_type
 
 if TYPE_CHECKING:
     pass
@@ -121,11 +120,7 @@ class ImageGenerationTool(FunctionTool[AstrAgentContext]):
 
         # 工具调用同样支持获取上下文参考图（消息/引用/头像）
         images_data = []
-        capabilities = (
-            plugin.generator.adapter.get_capabilities()
-            if plugin.generator and plugin.generator.adapter
-            else ImageCapability.NONE
-        )
+        capabilities = plugin.capabilities
 
         try:
             if capabilities & ImageCapability.IMAGE_TO_IMAGE:
@@ -157,7 +152,9 @@ class ImageGenerationTool(FunctionTool[AstrAgentContext]):
                                 user_id
                             )
                             if avatar_data:
-                                images_data.append((avatar_data, "image/jpeg"))
+                                images_data.append(
+                                    (avatar_data, detect_mime_type(avatar_data))
+                                )
                                 logger.info(
                                     f"[ImageGen] 已添加 {user_id} 的头像作为参考图"
                                 )
@@ -166,12 +163,12 @@ class ImageGenerationTool(FunctionTool[AstrAgentContext]):
             # 参考图处理失败不影响文生图流程，记录日志继续执行
 
         # 生成任务 ID
-        task_id = hashlib.md5(
-            f"{time.time()}{event.unified_msg_origin}".encode()
-        ).hexdigest()[:8]
+        task_id = plugin.next_task_id()
 
         # 创建后台任务进行生图
-        plugin.create_background_task(
+        plugin.submit_generation_task(
+            task_id,
+            event.unified_msg_origin,
             plugin._generate_and_send_image_async(
                 prompt=prompt,
                 images_data=images_data or None,
@@ -181,7 +178,7 @@ class ImageGenerationTool(FunctionTool[AstrAgentContext]):
                 resolution=kwargs.get("resolution")
                 or plugin.config_manager.default_resolution,
                 task_id=task_id,
-            )
+            ),
         )
 
         mode = "图生图" if images_data else "文生图"
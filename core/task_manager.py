@@ -3,32 +3,64 @@ from __future__ import annotations
 import asyncio
 import functools
 from collections.abc import Callable, Coroutine
-from datetime import datetime
+from datetime import date
 from typing import Any
 
 from astrbot.api import logger
 
 
+_EXPECTED_TASK_ERRORS = (asyncio.TimeoutError, ConnectionError, OSError)
+"""网络抖动等可预期的短暂错误，只记录警告而不输出堆栈。"""
+
+
+def _next_deadline(deadline: float, interval: float, now: float) -> float:
+    """计算下一次执行的截止时间；落后超过一个周期时不再追赶，从当前时间重新计时。"""
+    deadline += interval
+    if deadline <= now:
+        deadline = now + interval
+    return deadline
+
+
 class TaskManager:
     """统一的任务管理器，管理插件的后台任务和定时任务。"""
 
     def __init__(self):
         self.background_tasks: set[asyncio.Task] = set()
+        self._discard = self.background_tasks.discard
         self._loop_tasks: dict[str, asyncio.Task] = {}
-        self._daily_tasks: dict[str, asyncio.Task] = {}
-        self._last_run_dates: dict[str, str] = {}  # 记录每日任务上次执行的日期
-        self._startup_tasks: list[Callable[[], Coroutine[Any, Any, Any]]] = []
+        # 每日任务注册表: 名称 -> (协程函数, 检查间隔)
+        self._daily_tasks: dict[
+            str, tuple[Callable[[], Coroutine[Any, Any, Any]], float]
+        ] = {}
+        self._daily_running: dict[str, asyncio.Task] = {}  # 正在执行的每日任务
+        self._daily_ticker: asyncio.Task | None = None  # 共用的日期检查循环
+        self._last_run_days: dict[str, int] = {}  # 记录每日任务上次执行日期的序数
+        self._startup_tasks: list[
+            tuple[str, Callable[[], Coroutine[Any, Any, Any]]]
+        ] = []  # 按注册顺序依次执行
+        self._unordered_startup_tasks: list[
+            tuple[str, Callable[[], Coroutine[Any, Any, Any]]]
+        ] = []  # 与其他任务无依赖，并发执行
         self._startup_completed: bool = False
 
     def create_task(
-        self, coro: Coroutine[Any, Any, Any], name: str | None = None
+        self,
+        coro: Coroutine[Any, Any, Any],
+        name: str | None = None,
+        track: bool = True,
     ) -> asyncio.Task:
-        """创建一个普通的后台任务。"""
-        task = asyncio.create_task(coro)
-        if name:
-            task.set_name(name)
-        self.background_tasks.add(task)
-        task.add_done_callback(self.background_tasks.discard)
+        """创建一个普通的后台任务。
+
+        Args:
+            coro: 要执行的协程。
+            name: 任务名称。
+            track: 是否纳入管理。为 False 时不持有任务引用，`cancel_all` 也无法取消它，
+                调用方需自行 await 或保存返回的任务，否则任务可能被垃圾回收。
+        """
+        task = asyncio.create_task(coro, name=name)
+        if track:
+            self.background_tasks.add(task)
+            task.add_done_callback(self._discard)
         return task
 
     def start_loop_task(
@@ -37,39 +69,70 @@ class TaskManager:
         coro_func: Callable[[], Coroutine[Any, Any, Any]],
         interval_seconds: float,
         run_immediately: bool = True,
+        max_interval_seconds: float | None = None,
+        backoff_factor: float = 2.0,
     ) -> None:
         """启动一个周期性的定时任务。
 
+        指定 `max_interval_seconds` 后启用空闲退避：`coro_func` 返回 `False` 表示本次
+        无事可做，下次间隔乘以 `backoff_factor`（不超过上限）；返回其他值则恢复为
+        `interval_seconds`。
+
         Args:
             name: 任务名称，用于唯一标识和日志记录。
             coro_func: 返回协程的函数（任务的主逻辑）。
             interval_seconds: 执行间隔（秒）。
             run_immediately: 是否在启动时立即执行一次。
+            max_interval_seconds: 空闲退避的最大间隔（秒），为 None 时不退避。
+            backoff_factor: 空闲退避时间隔的增长倍数。
         """
         if name in self._loop_tasks:
             self.stop_loop_task(name)
 
+        current_interval = interval_seconds
+
+        def _update_interval(result: Any) -> None:
+            nonlocal current_interval
+            if max_interval_seconds and result is False:
+                current_interval = min(
+                    current_interval * backoff_factor, max_interval_seconds
+                )
+            else:
+                current_interval = interval_seconds
+
         async def _loop():
             if run_immediately:
                 try:
-                    await coro_func()
+                    _update_interval(await coro_func())
+                except _EXPECTED_TASK_ERRORS as e:
+                    logger.warning(
+                        f"[ImageGen] [TaskManager] 定时任务 {name} 初始执行短暂失败: {e!r}"
+                    )
                 except Exception as e:
                     logger.error(
                         f"[ImageGen] [TaskManager] 定时任务 {name} 初始执行失败: {e}",
                         exc_info=True,
                     )
 
+            # 按绝对截止时间调度，执行耗时不会累积为周期漂移
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + current_interval
             while True:
                 try:
-                    await asyncio.sleep(interval_seconds)
-                    await coro_func()
+                    await asyncio.sleep(max(0.0, deadline - loop.time()))
+                    _update_interval(await coro_func())
                 except asyncio.CancelledError:
                     break
+                except _EXPECTED_TASK_ERRORS as e:
+                    logger.warning(
+                        f"[ImageGen] [TaskManager] 定时任务 {name} 短暂失败: {e!r}"
+                    )
                 except Exception as e:
                     logger.error(
                         f"[ImageGen] [TaskManager] 定时任务 {name} 执行出错: {e}",
                         exc_info=True,
                     )
+                deadline = _next_deadline(deadline, current_interval, loop.time())
 
         task = asyncio.create_task(_loop(), name=f"loop_{name}")
         self._loop_tasks[name] = task
@@ -88,21 +151,27 @@ class TaskManager:
 
     def _on_loop_task_done(self, name: str, task: asyncio.Task) -> None:
         """定时任务结束时的回调。"""
-        self.background_tasks.discard(task)
+        self._discard(task)
         self._loop_tasks.pop(name, None)
 
     def register_startup_task(
         self,
         name: str,
         coro_func: Callable[[], Coroutine[Any, Any, Any]],
+        ordered: bool = True,
     ) -> None:
         """注册一个启动时执行的任务。
 
         Args:
             name: 任务名称，用于日志记录。
             coro_func: 返回协程的函数（任务的主逻辑）。
+            ordered: 是否需要按注册顺序执行。为 False 时表示与其他任务无依赖，
+                将在顺序任务完成后并发执行。
         """
-        self._startup_tasks.append((name, coro_func))
+        if ordered:
+            self._startup_tasks.append((name, coro_func))
+        else:
+            self._unordered_startup_tasks.append((name, coro_func))
         logger.info(f"[ImageGen] [TaskManager] 已注册启动任务: {name}")
 
     async def run_startup_tasks(self) -> None:
@@ -114,29 +183,41 @@ class TaskManager:
             logger.warning("[ImageGen] [TaskManager] 启动任务已执行过，跳过重复执行")
             return
 
-        if not self._startup_tasks:
+        total = len(self._startup_tasks) + len(self._unordered_startup_tasks)
+        if not total:
             logger.info("[ImageGen] [TaskManager] 没有注册的启动任务")
             self._startup_completed = True
             return
 
-        logger.info(
-            f"[ImageGen] [TaskManager] 开始执行 {len(self._startup_tasks)} 个启动任务"
-        )
+        logger.info(f"[ImageGen] [TaskManager] 开始执行 {total} 个启动任务")
 
         for name, coro_func in self._startup_tasks:
-            try:
-                logger.info(f"[ImageGen] [TaskManager] 执行启动任务: {name}")
-                await coro_func()
-                logger.info(f"[ImageGen] [TaskManager] 启动任务 {name} 执行完成")
-            except Exception as e:
-                logger.error(
-                    f"[ImageGen] [TaskManager] 启动任务 {name} 执行失败: {e}",
-                    exc_info=True,
+            await self._run_startup_task(name, coro_func)
+        if self._unordered_startup_tasks:
+            await asyncio.gather(
+                *(
+                    self._run_startup_task(name, coro_func)
+                    for name, coro_func in self._unordered_startup_tasks
                 )
+            )
 
         self._startup_completed = True
         logger.info("[ImageGen] [TaskManager] 所有启动任务执行完毕")
 
+    async def _run_startup_task(
+        self, name: str, coro_func: Callable[[], Coroutine[Any, Any, Any]]
+    ) -> None:
+        """执行单个启动任务并记录结果。"""
+        try:
+            logger.info(f"[ImageGen] [TaskManager] 执行启动任务: {name}")
+            await coro_func()
+            logger.info(f"[ImageGen] [TaskManager] 启动任务 {name} 执行完成")
+        except Exception as e:
+            logger.error(
+                f"[ImageGen] [TaskManager] 启动任务 {name} 执行失败: {e}",
+                exc_info=True,
+            )
+
     def start_daily_task(
         self,
         name: str,
@@ -146,6 +227,8 @@ class TaskManager:
     ) -> None:
         """启动一个每日任务，在日期变更时执行。
 
+        所有每日任务共用一个检查循环，按已注册任务中最短的检查间隔运行。
+
         Args:
             name: 任务名称，用于唯一标识和日志记录。
             coro_func: 返回协程的函数（任务的主逻辑）。
@@ -155,74 +238,100 @@ class TaskManager:
         if name in self._daily_tasks:
             self.stop_daily_task(name)
 
-        async def _daily_loop():
-            # 初始化上次执行日期
-            if run_immediately:
-                try:
-                    await coro_func()
-                    self._last_run_dates[name] = datetime.now().strftime("%Y-%m-%d")
-                    logger.info(
-                        f"[ImageGen] [TaskManager] 每日任务 {name} 初始执行完成"
+        self._daily_tasks[name] = (coro_func, check_interval_seconds)
+        today = date.today().toordinal()
+        if run_immediately:
+            self._run_daily_task(name, today)
+        else:
+            # 记录当前日期，避免启动当天重复执行
+            self._last_run_days[name] = today
+
+        if self._daily_ticker is None:
+            self._daily_ticker = self.create_task(
+                self._daily_ticker_loop(), name="daily_ticker"
+            )
+            self._daily_ticker.add_done_callback(self._on_daily_ticker_done)
+        logger.info(
+            f"[ImageGen] [TaskManager] 每日任务 {name} 已启动 (检查间隔: {check_interval_seconds}s)"
+        )
+
+    async def _daily_ticker_loop(self) -> None:
+        """所有每日任务共用的日期检查循环。"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while self._daily_tasks:
+            interval = min(interval for _, interval in self._daily_tasks.values())
+            deadline = _next_deadline(deadline, interval, loop.time())
+            try:
+                await asyncio.sleep(max(0.0, deadline - loop.time()))
+                # 以日期序数比较，仅在日期变更时才格式化日期用于日志
+                current_day = date.today().toordinal()
+                for name in list(self._daily_tasks):
+                    last_run_day = self._last_run_days.get(name, -1)
+                    if current_day == last_run_day or name in self._daily_running:
+                        continue
+                    last_run_date = (
+                        date.fromordinal(last_run_day).isoformat()
+                        if last_run_day > 0
+                        else None
                     )
-                except Exception as e:
-                    logger.error(
-                        f"[ImageGen] [TaskManager] 每日任务 {name} 初始执行失败: {e}",
-                        exc_info=True,
+                    current_date = date.fromordinal(current_day).isoformat()
+                    logger.info(
+                        f"[ImageGen] [TaskManager] 检测到日期变更 ({last_run_date} -> {current_date})，执行每日任务 {name}"
                     )
-            else:
-                # 记录当前日期，避免启动当天重复执行
-                self._last_run_dates[name] = datetime.now().strftime("%Y-%m-%d")
+                    self._run_daily_task(name, current_day)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(
+                    f"[ImageGen] [TaskManager] 每日任务检查循环出错: {e}",
+                    exc_info=True,
+                )
 
-            while True:
-                try:
-                    await asyncio.sleep(check_interval_seconds)
-                    current_date = datetime.now().strftime("%Y-%m-%d")
-                    last_run_date = self._last_run_dates.get(name)
-
-                    if current_date != last_run_date:
-                        logger.info(
-                            f"[ImageGen] [TaskManager] 检测到日期变更 ({last_run_date} -> {current_date})，执行每日任务 {name}"
-                        )
-                        try:
-                            await coro_func()
-                            self._last_run_dates[name] = current_date
-                            logger.info(
-                                f"[ImageGen] [TaskManager] 每日任务 {name} 执行完成"
-                            )
-                        except Exception as e:
-                            logger.error(
-                                f"[ImageGen] [TaskManager] 每日任务 {name} 执行出错: {e}",
-                                exc_info=True,
-                            )
-                except asyncio.CancelledError:
-                    break
-                except Exception as e:
-                    logger.error(
-                        f"[ImageGen] [TaskManager] 每日任务 {name} 循环出错: {e}",
-                        exc_info=True,
-                    )
+    def _run_daily_task(self, name: str, day: int) -> None:
+        """在后台执行一次每日任务，成功后记录执行日期。"""
+        coro_func, _ = self._daily_tasks[name]
 
-        task = asyncio.create_task(_daily_loop(), name=f"daily_{name}")
-        self._daily_tasks[name] = task
-        self.background_tasks.add(task)
-        task.add_done_callback(functools.partial(self._on_daily_task_done, name))
-        logger.info(
-            f"[ImageGen] [TaskManager] 每日任务 {name} 已启动 (检查间隔: {check_interval_seconds}s)"
-        )
+        async def _run():
+            try:
+                await coro_func()
+                self._last_run_days[name] = day
+                logger.info(f"[ImageGen] [TaskManager] 每日任务 {name} 执行完成")
+            except _EXPECTED_TASK_ERRORS as e:
+                logger.warning(
+                    f"[ImageGen] [TaskManager] 每日任务 {name} 短暂失败: {e!r}"
+                )
+            except Exception as e:
+                logger.error(
+                    f"[ImageGen] [TaskManager] 每日任务 {name} 执行出错: {e}",
+                    exc_info=True,
+                )
+
+        task = self.create_task(_run(), name=f"daily_{name}")
+        self._daily_running[name] = task
+        task.add_done_callback(functools.partial(self._on_daily_run_done, name))
 
     def stop_daily_task(self, name: str) -> None:
         """停止指定的每日任务。"""
-        if task := self._daily_tasks.pop(name, None):
-            if not task.done():
-                task.cancel()
-            self._last_run_dates.pop(name, None)
-            logger.info(f"[ImageGen] [TaskManager] 每日任务 {name} 已停止")
-
-    def _on_daily_task_done(self, name: str, task: asyncio.Task) -> None:
-        """每日任务结束时的回调。"""
-        self.background_tasks.discard(task)
-        self._daily_tasks.pop(name, None)
-        self._last_run_dates.pop(name, None)
+        if self._daily_tasks.pop(name, None) is None:
+            return
+        self._last_run_days.pop(name, None)
+        if (task := self._daily_running.pop(name, None)) and not task.done():
+            task.cancel()
+        if not self._daily_tasks and self._daily_ticker:
+            self._daily_ticker.cancel()
+            self._daily_ticker = None
+        logger.info(f"[ImageGen] [TaskManager] 每日任务 {name} 已停止")
+
+    def _on_daily_run_done(self, name: str, task: asyncio.Task) -> None:
+        """单次每日任务执行结束时的回调。"""
+        if self._daily_running.get(name) is task:
+            del self._daily_running[name]
+
+    def _on_daily_ticker_done(self, task: asyncio.Task) -> None:
+        """每日任务检查循环结束时的回调。"""
+        if self._daily_ticker is task:
+            self._daily_ticker = None
 
     async def cancel_all(self):
         """取消所有正在运行的任务。"""
@@ -236,5 +345,7 @@ class TaskManager:
         self.background_tasks.clear()
         self._loop_tasks.clear()
         self._daily_tasks.clear()
-        self._last_run_dates.clear()
+        self._daily_running.clear()
+        self._daily_ticker = None
+        self._last_run_days.clear()
         logger.info("[ImageGen] [TaskManager] 所有后台任务已取消")
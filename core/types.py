@@ -24,7 +24,7 @@ class ImageCapability(enum.Flag):
     ASPECT_RATIO = enum.auto()  # 指定宽高比
 
 
-@dataclass
+@dataclass(slots=True)
 class AdapterMetadata:
     """关于适配器能力的元数据。"""
 
@@ -32,7 +32,7 @@ class AdapterMetadata:
     capabilities: ImageCapability = ImageCapability.TEXT_TO_IMAGE
 
 
-@dataclass
+@dataclass(slots=True)
 class AdapterConfig:
     """构造适配器所需的配置。"""
 
@@ -48,7 +48,7 @@ class AdapterConfig:
     safety_settings: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class ImageData:
     """带有 MIME 类型的图像二进制数据。"""
 
@@ -56,7 +56,7 @@ class ImageData:
     mime_type: str
 
 
-@dataclass
+@dataclass(slots=True)
 class GenerationRequest:
     """用户生图请求。"""
 
@@ -67,7 +67,7 @@ class GenerationRequest:
     task_id: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class GenerationResult:
     """生图尝试的结果。"""
 
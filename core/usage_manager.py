@@ -4,15 +4,16 @@
 
 from __future__ import annotations
 
+import asyncio
 import datetime
-import json
 import os
 import time
 from typing import TYPE_CHECKING
 
 from astrbot.api import logger
 
-from .constants import USAGE_DATA_RETENTION_DAYS
+from .constants import RATE_LIMIT_PURGE_INTERVAL_SECONDS, USAGE_DATA_RETENTION_DAYS
+from .utils import json_dumps, json_loads
 
 if TYPE_CHECKING:
     from .config_manager import UsageSettings
@@ -26,30 +27,45 @@ class UsageManager:
         self._settings = settings
         self._usage_file = os.path.join(data_dir, "usage.json")
         self._usage_data: dict[str, dict[str, int]] = {}  # {date: {user_id: count}}
-        self._user_request_timestamps: dict[str, float] = {}  # 用于频率限制
+        self._user_request_timestamps: dict[str, float] = {}  # 用于频率限制（单调时钟）
+        self._last_purge: float = 0.0  # 上次清理频率限制记录的单调时钟时间
+        self._today_iso: str = ""  # 缓存的今日日期字符串
+        self._today_expires: float = 0.0  # 缓存失效时间，即下一个本地午夜的时间戳
+        self._dirty: bool = False  # 是否有尚未写入磁盘的使用数据
+        self._flush_lock = asyncio.Lock()
         self._load_usage_data()
 
     def update_settings(self, settings: UsageSettings) -> None:
         """更新设置。"""
         self._settings = settings
 
+    def _today(self) -> str:
+        """获取今日的 ISO 日期字符串，同一天内复用缓存结果。"""
+        if time.time() >= self._today_expires:
+            today = datetime.date.today()
+            self._today_iso = today.isoformat()
+            tomorrow = today + datetime.timedelta(days=1)
+            self._today_expires = datetime.datetime.combine(
+                tomorrow, datetime.time.min
+            ).timestamp()
+        return self._today_iso
+
     def _load_usage_data(self) -> None:
         """加载用户使用数据。"""
         if os.path.exists(self._usage_file):
             try:
-                with open(self._usage_file, encoding="utf-8") as f:
-                    self._usage_data = json.load(f)
+                with open(self._usage_file, "rb") as f:
+                    self._usage_data = json_loads(f.read())
 
                 # 清理旧数据，只保留最近 N 天（由 USAGE_DATA_RETENTION_DAYS 控制）
-                today = datetime.date.today()
-                keys_to_delete = []
-                for date_str in self._usage_data:
-                    try:
-                        date_obj = datetime.date.fromisoformat(date_str)
-                        if (today - date_obj).days > USAGE_DATA_RETENTION_DAYS:
-                            keys_to_delete.append(date_str)
-                    except ValueError:
-                        keys_to_delete.append(date_str)
+                # YYYY-MM-DD 格式的字符串顺序即日期顺序，直接比较无需解析；长度不符的键视为无效
+                cutoff = (
+                    datetime.date.today()
+                    - datetime.timedelta(days=USAGE_DATA_RETENTION_DAYS)
+                ).isoformat()
+                keys_to_delete = [
+                    key for key in self._usage_data if len(key) != 10 or key < cutoff
+                ]
 
                 if keys_to_delete:
                     for key in keys_to_delete:
@@ -59,14 +75,54 @@ class UsageManager:
                 logger.error(f"[ImageGen] 加载使用数据失败: {exc}")
                 self._usage_data = {}
 
-    def _save_usage_data(self) -> None:
-        """保存用户使用数据。"""
+    def _save_usage_data(
+        self, usage_data: dict[str, dict[str, int]] | None = None
+    ) -> bool:
+        """保存用户使用数据，返回是否保存成功。
+
+        在工作线程中调用时应传入数据快照，避免与事件循环中的修改冲突。
+        """
+        if usage_data is None:
+            usage_data = self._usage_data
         try:
             os.makedirs(os.path.dirname(self._usage_file), exist_ok=True)
-            with open(self._usage_file, "w", encoding="utf-8") as f:
-                json.dump(self._usage_data, f, ensure_ascii=False, indent=2)
+            # 先写入临时文件再原子替换，避免中断时留下不完整的文件
+            tmp_file = f"{self._usage_file}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write(json_dumps(usage_data))
+            os.replace(tmp_file, self._usage_file)
         except Exception as exc:
             logger.error(f"[ImageGen] 保存使用数据失败: {exc}")
+            return False
+        return True
+
+    async def flush_if_dirty(self) -> bool:
+        """将尚未保存的使用数据写入磁盘，返回本次是否有数据写入。
+
+        `record_usage` 只标记数据已变更，由定时任务或插件卸载时调用本方法批量落盘。
+        """
+        async with self._flush_lock:
+            if not self._dirty:
+                return False
+            self._dirty = False
+            snapshot = {day: dict(counts) for day, counts in self._usage_data.items()}
+            write = asyncio.ensure_future(
+                asyncio.to_thread(self._save_usage_data, snapshot)
+            )
+            try:
+                saved = await asyncio.shield(write)
+            except asyncio.CancelledError:
+                self._dirty = True
+                # 工作线程中的写入无法中止，持锁等待其结束，避免下一次落盘同时写入临时文件
+                while not write.done():
+                    try:
+                        await asyncio.shield(write)
+                    except asyncio.CancelledError:
+                        pass
+                raise
+            if not saved:
+                self._dirty = True
+            return saved
 
     def check_rate_limit(self, user_id: str) -> bool | str:
         """检查用户请求频率限制和每日限制。
@@ -77,16 +133,20 @@ class UsageManager:
         """
         # 1. 检查频率限制
         if self._settings.rate_limit_seconds > 0:
-            now = time.time()
-            last_ts = self._user_request_timestamps.get(user_id, 0)
-            if now - last_ts < self._settings.rate_limit_seconds:
-                remaining = int(self._settings.rate_limit_seconds - (now - last_ts))
+            # 使用单调时钟，不受系统时间调整影响
+            now = time.monotonic()
+            last_ts = self._user_request_timestamps.get(user_id)
+            elapsed = now - last_ts if last_ts is not None else None
+            if elapsed is not None and elapsed < self._settings.rate_limit_seconds:
+                remaining = int(self._settings.rate_limit_seconds - elapsed)
                 return f"❌ 请求过于频繁，请在 {remaining} 秒后再试"
             self._user_request_timestamps[user_id] = now
+            if now - self._last_purge > RATE_LIMIT_PURGE_INTERVAL_SECONDS:
+                self._purge_request_timestamps(now)
 
         # 2. 检查每日限制
         if self._settings.enable_daily_limit:
-            today = datetime.date.today().isoformat()
+            today = self._today()
             if today not in self._usage_data:
                 self._usage_data[today] = {}
 
@@ -96,20 +156,30 @@ class UsageManager:
 
         return True
 
+    def _purge_request_timestamps(self, now: float) -> None:
+        """清理早已超出频率限制窗口的用户记录，避免随用户数无限增长。"""
+        cutoff = now - max(self._settings.rate_limit_seconds * 10, 60)
+        self._user_request_timestamps = {
+            user_id: ts
+            for user_id, ts in self._user_request_timestamps.items()
+            if ts >= cutoff
+        }
+        self._last_purge = now
+
     def record_usage(self, user_id: str) -> None:
         """记录用户使用次数。"""
         if self._settings.enable_daily_limit:
-            today = datetime.date.today().isoformat()
+            today = self._today()
             if today not in self._usage_data:
                 self._usage_data[today] = {}
             self._usage_data[today][user_id] = (
                 self._usage_data[today].get(user_id, 0) + 1
             )
-            self._save_usage_data()
+            self._dirty = True
 
     def get_usage_count(self, user_id: str) -> int:
         """获取用户今日使用次数。"""
-        today = datetime.date.today().isoformat()
+        today = self._today()
         return self._usage_data.get(today, {}).get(user_id, 0)
 
     def get_daily_limit(self) -> int:
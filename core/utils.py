@@ -1,14 +1,28 @@
 from __future__ import annotations
 
 import asyncio
+import functools
+import json
 from collections.abc import Iterable
 from io import BytesIO
+from typing import Any
 
 from PIL import Image
 
+try:
+    import pybase64 as _base64
+except ImportError:  # 可选依赖，缺失时回退到标准库
+    import base64 as _base64
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，缺失时回退到标准库
+    orjson = None
+
 from astrbot.api import logger
 
 from .constants import (
+    CONVERT_CHUNK_SIZE,
     MASK_MIN_LENGTH,
     MASK_PLACEHOLDER,
     MASK_VISIBLE_CHARS,
@@ -17,56 +31,107 @@ from .constants import (
 )
 from .types import ImageData
 
-SUPPORTED_IMAGE_FORMATS = {
-    "image/png",
-    "image/jpeg",
-    "image/webp",
-    "image/heic",
-    "image/heif",
-}
+SUPPORTED_IMAGE_FORMATS = frozenset(
+    {
+        "image/png",
+        "image/jpeg",
+        "image/webp",
+        "image/heic",
+        "image/heif",
+    }
+)
+
+# 使用 constants.py 中的定义，转换为不可变集合供成员检查
+ALLOWED_ASPECT_RATIOS = frozenset(SUPPORTED_ASPECT_RATIOS)
+ALLOWED_RESOLUTIONS = frozenset(SUPPORTED_RESOLUTIONS)
 
-# 使用 constants.py 中的定义，转换为 set 以保持向后兼容
-ALLOWED_ASPECT_RATIOS = set(SUPPORTED_ASPECT_RATIOS)
-ALLOWED_RESOLUTIONS = set(SUPPORTED_RESOLUTIONS)
+# 校验用的查找表：合法值映射到自身，一次字典查找即可完成校验
+_ASPECT_RATIO_LOOKUP = {value: value for value in ALLOWED_ASPECT_RATIOS}
+_RESOLUTION_LOOKUP = {value: value for value in ALLOWED_RESOLUTIONS}
+
+
+_PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+_GIF_MAGICS = frozenset((b"GIF87a", b"GIF89a"))
+_HEIC_BRANDS = frozenset((b"heic", b"heix", b"heim", b"heis"))
+_HEIF_BRANDS = frozenset((b"mif1", b"msf1", b"heif"))
 
 
 def detect_mime_type(data: bytes) -> str:
     """根据魔数（Magic Numbers）尽力检测 MIME 类型。"""
 
-    if data.startswith(b"\xff\xd8"):
-        return "image/jpeg"
-    if data.startswith(b"\x89PNG\r\n\x1a\n"):
-        return "image/png"
-    if data.startswith(b"GIF87a") or data.startswith(b"GIF89a"):
-        return "image/gif"
+    # 先按首字节分派，每种格式只需一两次比较
+    head = data[:1]
+    if head == b"\xff":
+        if data[1:2] == b"\xd8":
+            return "image/jpeg"
+    elif head == b"\x89":
+        if data[:8] == _PNG_MAGIC:
+            return "image/png"
+    elif head == b"G":
+        if data[:6] in _GIF_MAGICS:
+            return "image/gif"
+    elif head == b"R":
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            return "image/webp"
     if len(data) > 12 and data[4:8] == b"ftyp":
         brand = data[8:12]
-        if brand in (b"heic", b"heix", b"heim", b"heis"):
+        if brand in _HEIC_BRANDS:
             return "image/heic"
-        if brand in (b"mif1", b"msf1", b"heif"):
+        if brand in _HEIF_BRANDS:
             return "image/heif"
-    if data.startswith(b"RIFF") and data[8:12] == b"WEBP":
-        return "image/webp"
     return "application/octet-stream"
 
 
+def encode_base64(data: bytes) -> str:
+    """将二进制数据编码为 Base64 字符串（优先使用 pybase64 加速）。"""
+
+    return _base64.b64encode(data).decode("ascii")
+
+
+def decode_base64(data: str | bytes) -> bytes:
+    """解码 Base64 数据（优先使用 pybase64 加速）。"""
+
+    return _base64.b64decode(data, validate=False)
+
+
+def json_dumps(obj: Any) -> str:
+    """序列化 JSON（优先使用 orjson 加速）。"""
+
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def json_loads(data: str | bytes) -> Any:
+    """反序列化 JSON（优先使用 orjson 加速）。"""
+
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def to_data_url(image: ImageData) -> str:
+    """将图像编码为 Data URL。"""
+
+    return "".join(("data:", image.mime_type, ";base64,", encode_base64(image.data)))
+
+
 def _sync_convert_image_format(image_data: bytes, mime_type: str) -> ImageData:
     """同步将不支持的图像转换为 JPEG。"""
 
     try:
         img = Image.open(BytesIO(image_data))
 
-        if img.mode in ("RGBA", "LA", "P"):
+        if img.mode in ("LA", "P"):
+            img = img.convert("RGBA")
+        if img.mode == "RGBA":
+            # 以 RGBA 图像本身作为蒙版时 Pillow 直接使用其 alpha 通道，无需 split()
             background = Image.new("RGB", img.size, (255, 255, 255))
-            if img.mode == "P":
-                img = img.convert("RGBA")
-            elif img.mode == "LA":
-                img = img.convert("RGBA")
-            background.paste(img, mask=img.split()[3])
+            background.paste(img, mask=img)
             img = background
 
         output = BytesIO()
-        img.save(output, format="JPEG", quality=95)
+        img.save(output, format="JPEG", quality=90)
         logger.debug("[ImageGen] 已将图像转换为 JPEG")
         return ImageData(data=output.getvalue(), mime_type="image/jpeg")
     except Exception as exc:  # noqa: BLE001
@@ -74,21 +139,68 @@ def _sync_convert_image_format(image_data: bytes, mime_type: str) -> ImageData:
         return ImageData(data=image_data, mime_type=mime_type)
 
 
-async def convert_image_format(image_data: bytes, mime_type: str) -> ImageData:
-    """如果 MIME 类型不支持，则转换图像。"""
+def _sync_convert_batch(items: list[tuple[bytes, str]]) -> list[ImageData]:
+    """同步批量将不支持的图像转换为 JPEG。"""
+
+    results = []
+    for image_data, mime_type in items:
+        logger.info(f"[ImageGen] 正在转换图像格式: {mime_type} -> image/jpeg")
+        results.append(_sync_convert_image_format(image_data, mime_type))
+    return results
+
+
+def _as_supported(image_data: bytes, mime_type: str, verify: bool) -> ImageData | None:
+    """图像已是受支持的格式时直接返回，否则返回 None 表示需要转换。"""
 
+    if not verify and mime_type in SUPPORTED_IMAGE_FORMATS:
+        return ImageData(data=image_data, mime_type=mime_type)
     real_mime = detect_mime_type(image_data)
     if real_mime in SUPPORTED_IMAGE_FORMATS:
         return ImageData(data=image_data, mime_type=real_mime)
+    return None
+
+
+async def convert_image_format(
+    image_data: bytes,
+    mime_type: str,
+    *,
+    verify: bool = False,
+) -> ImageData:
+    """如果 MIME 类型不支持，则转换图像。
+
+    声明的 MIME 类型已受支持时直接信任，不再检测魔数；来源不可信时可传入
+    `verify=True` 强制检测。
+    """
+
+    if image := _as_supported(image_data, mime_type, verify):
+        return image
     logger.info(f"[ImageGen] 正在转换图像格式: {mime_type} -> image/jpeg")
     return await asyncio.to_thread(_sync_convert_image_format, image_data, mime_type)
 
 
 async def convert_images_batch(images: Iterable[ImageData]) -> list[ImageData]:
-    """并行批量转换图像。"""
+    """批量转换图像，保持原有顺序。
+
+    无需转换的图像直接返回，需要转换的图像按块合并到线程调用中处理。
+    """
 
-    tasks = [convert_image_format(img.data, img.mime_type) for img in images]
-    return await asyncio.gather(*tasks)
+    results: list[ImageData | None] = []
+    pending: list[tuple[int, ImageData]] = []
+    for img in images:
+        image = _as_supported(img.data, img.mime_type, False)
+        if image is None:
+            pending.append((len(results), img))
+        results.append(image)
+
+    # 分块提交到工作线程，每块完成后回到事件循环，避免大批量转换长时间占用
+    for start in range(0, len(pending), CONVERT_CHUNK_SIZE):
+        chunk = pending[start : start + CONVERT_CHUNK_SIZE]
+        converted = await asyncio.to_thread(
+            _sync_convert_batch, [(img.data, img.mime_type) for _, img in chunk]
+        )
+        for (index, _), image in zip(chunk, converted):
+            results[index] = image
+    return results
 
 
 def validate_aspect_ratio(value: str | None) -> str | None:
@@ -96,7 +208,7 @@ def validate_aspect_ratio(value: str | None) -> str | None:
 
     if value is None:
         return None
-    return value if value in ALLOWED_ASPECT_RATIOS else None
+    return _ASPECT_RATIO_LOOKUP.get(value)
 
 
 def validate_resolution(value: str | None) -> str | None:
@@ -104,9 +216,10 @@ def validate_resolution(value: str | None) -> str | None:
 
     if value is None:
         return None
-    return value if value in ALLOWED_RESOLUTIONS else None
+    return _RESOLUTION_LOOKUP.get(value)
 
 
+@functools.lru_cache(maxsize=128)
 def mask_sensitive(
     value: str,
     visible_chars: int = MASK_VISIBLE_CHARS,
@@ -124,6 +237,7 @@ def mask_sensitive(
     Returns:
         脱敏后的字符串
     """
+    # 同一个 API Key 会在多条日志中反复出现，结果经 lru_cache 复用
     if len(value) <= min_length:
         return placeholder
-    return f"{value[:visible_chars]}{placeholder}{value[-visible_chars:]}"
+    return value[:visible_chars] + placeholder + value[-visible_chars:]
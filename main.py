@@ -7,9 +7,11 @@ AstrBot 图像生成插件主模块
 from __future__ import annotations
 
 import asyncio
-import hashlib
-import json
+import functools
+import itertools
+import logging
 import time
+from collections import OrderedDict
 from collections.abc import Coroutine
 from typing import Any
 
@@ -19,7 +21,13 @@ from astrbot.api.star import Context, Star
 from astrbot.core.config.astrbot_config import AstrBotConfig
 from astrbot.core.star.star_tools import StarTools
 
+from .core.base_adapter import BaseImageAdapter
 from .core.config_manager import ConfigManager
+from .core.constants import (
+    MAX_PENDING_GENERATION_TASKS,
+    USAGE_FLUSH_INTERVAL_SECONDS,
+    USAGE_FLUSH_MAX_INTERVAL_SECONDS,
+)
 from .core.generator import ImageGenerator
 from .core.image_processor import ImageProcessor
 from .core.llm_tool import ImageGenerationTool, adjust_tool_parameters
@@ -29,6 +37,19 @@ from .core.usage_manager import UsageManager
 from .core.utils import mask_sensitive, validate_aspect_ratio, validate_resolution
 
 
+def _split_command(message: str) -> tuple[str, str, str]:
+    """拆分已去除首尾空白的指令消息。
+
+    Returns:
+        (参数部分, 第一个参数, 其余参数)，缺失的部分为空字符串。
+    """
+    parts = message.split(maxsplit=2)
+    if len(parts) < 2:
+        return "", "", ""
+    args = message[len(parts[0]) :].lstrip()
+    return args, parts[1], parts[2] if len(parts) > 2 else ""
+
+
 class ImageGenerationPlugin(Star):
     """图像生成插件主类"""
 
@@ -62,14 +83,24 @@ class ImageGenerationPlugin(Star):
         # 初始化生成器
         self.generator: ImageGenerator | None = None
         self.semaphore: asyncio.Semaphore | None = None
+        self.capabilities = ImageCapability.NONE  # 当前适配器能力，切换适配器时刷新
+        # 预先展开的能力标志: (支持参考图, 支持指定比例, 支持指定分辨率)
+        self._cap_flags: tuple[bool, bool, bool] = (False, False, False)
+        self._task_counter = itertools.count(1)  # 任务 ID 计数器
+        # 排队中（尚未开始执行）的生图任务: task_id -> (任务, 会话标识)
+        self._pending_generations: OrderedDict[str, tuple[asyncio.Task, str]] = (
+            OrderedDict()
+        )
 
 
     # ---------------------- 生命周期 ----------------------
 
     async def initialize(self):
         """插件加载时调用"""
-        if self.config_manager.adapter_config:
-            self.generator = ImageGenerator(self.config_manager.adapter_config)
+        adapter_config = self.config_manager.adapter_config
+        if adapter_config:
+            self.generator = ImageGenerator(adapter_config)
+            self._refresh_capabilities()
             self.semaphore = asyncio.Semaphore(self.config_manager.max_concurrent_tasks)
         else:
             logger.error("[ImageGen] 适配器配置加载失败，插件未初始化")
@@ -88,18 +119,26 @@ class ImageGenerationPlugin(Star):
         self.task_manager.create_task(self.task_manager.run_startup_tasks())
 
         logger.info(
-            f"[ImageGen] 插件加载完成，模型: {self.config_manager.adapter_config.model if self.config_manager.adapter_config else '未知'}"
+            f"[ImageGen] 插件加载完成，模型: {adapter_config.model if adapter_config else '未知'}"
         )
 
     async def terminate(self):
         """插件卸载时调用"""
-        try:
-            if self.generator:
-                await self.generator.close()
-            await self.task_manager.cancel_all()
-            logger.info("[ImageGen] 插件已卸载")
-        except Exception as exc:
-            logger.error(f"[ImageGen] 卸载清理出错: {exc}")
+        # 相互独立的清理步骤并发执行；使用数据需在后台任务取消后落盘，
+        # 共享 HTTP 会话也需在任务取消后关闭
+        first_stage = [self.task_manager.cancel_all()]
+        if self.generator:
+            first_stage.append(self.generator.close())
+        results = await asyncio.gather(*first_stage, return_exceptions=True)
+        results += await asyncio.gather(
+            self.usage_manager.flush_if_dirty(),
+            BaseImageAdapter.shutdown_all(),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"[ImageGen] 卸载清理出错: {result}")
+        logger.info("[ImageGen] 插件已卸载")
 
     # ---------------------- 内部工具 ----------------------
 
@@ -114,7 +153,16 @@ class ImageGenerationPlugin(Star):
             run_immediately=True,
         )
 
-        # 2. Jimeng2API 自动领积分任务
+        # 2. 使用数据定时落盘任务
+        self.task_manager.start_loop_task(
+            name="usage_flush",
+            coro_func=self.usage_manager.flush_if_dirty,
+            interval_seconds=USAGE_FLUSH_INTERVAL_SECONDS,
+            run_immediately=False,
+            max_interval_seconds=USAGE_FLUSH_MAX_INTERVAL_SECONDS,
+        )
+
+        # 3. Jimeng2API 自动领积分任务
         self._setup_jimeng_token_task()
 
     def _setup_jimeng_token_task(self) -> None:
@@ -142,6 +190,7 @@ class ImageGenerationPlugin(Star):
         self.task_manager.register_startup_task(
             name="jimeng_token_receive",
             coro_func=jimeng_adapter.receive_token,
+            ordered=False,
         )
 
         # 2. 注册为每日任务，日期变更时执行
@@ -157,13 +206,60 @@ class ImageGenerationPlugin(Star):
         """根据适配器能力动态调整工具参数。"""
         if not self.generator or not self.generator.adapter:
             return
-        capabilities = self.generator.adapter.get_capabilities()
-        adjust_tool_parameters(tool, capabilities)
+        adjust_tool_parameters(tool, self.capabilities)
+
+    def _refresh_capabilities(self) -> None:
+        """缓存当前适配器的能力，避免每次请求重复查询。"""
+        adapter = self.generator.adapter if self.generator else None
+        capabilities = adapter.get_capabilities() if adapter else ImageCapability.NONE
+        self.capabilities = capabilities
+        self._cap_flags = (
+            bool(capabilities & ImageCapability.IMAGE_TO_IMAGE),
+            bool(capabilities & ImageCapability.ASPECT_RATIO),
+            bool(capabilities & ImageCapability.RESOLUTION),
+        )
 
     def create_background_task(self, coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
         """创建后台任务并添加到管理器中。"""
         return self.task_manager.create_task(coro)
 
+    def submit_generation_task(
+        self,
+        task_id: str,
+        unified_msg_origin: str,
+        coro: Coroutine[Any, Any, Any],
+    ) -> asyncio.Task:
+        """提交生图任务，排队任务过多时取消最早排队的任务。"""
+        if len(self._pending_generations) >= MAX_PENDING_GENERATION_TASKS:
+            old_id, (old_task, old_origin) = self._pending_generations.popitem(
+                last=False
+            )
+            old_task.cancel()
+            logger.warning(f"[ImageGen] 排队任务过多，已取消最早排队的任务 {old_id}")
+            self.create_background_task(
+                self.context.send_message(
+                    old_origin,
+                    MessageChain().message(
+                        f"❌ 当前排队任务过多，任务 {old_id} 已被取消，请稍后重试"
+                    ),
+                )
+            )
+
+        task = self.create_background_task(coro)
+        self._pending_generations[task_id] = (task, unified_msg_origin)
+        task.add_done_callback(functools.partial(self._on_generation_done, task_id))
+        return task
+
+    def _on_generation_done(self, task_id: str, task: asyncio.Task) -> None:
+        """生图任务结束时移出排队列表。"""
+        entry = self._pending_generations.get(task_id)
+        if entry and entry[0] is task:
+            del self._pending_generations[task_id]
+
+    def next_task_id(self) -> str:
+        """生成进程内唯一的任务 ID（8 位十六进制）。"""
+        return f"{next(self._task_counter):08x}"
+
     # ---------------------- 核心生图逻辑 ----------------------
 
     async def _generate_and_send_image_async(
@@ -174,57 +270,75 @@ class ImageGenerationPlugin(Star):
         aspect_ratio: str = "1:1",
         resolution: str = "1K",
         task_id: str | None = None,
+        image_sources: list[tuple[bool, str]] | None = None,
     ) -> None:
-        """异步生成图片并发送。"""
+        """异步生成图片并发送。
+
+        `image_sources` 为尚未下载的参考图来源，在获得并发名额后才下载，
+        使参考图占用的内存同样受并发数限制。
+        """
         if not self.generator or not self.generator.adapter:
             return
 
-        capabilities = self.generator.adapter.get_capabilities()
+        supports_i2i, supports_ar, supports_res = self._cap_flags
 
         # 检查并清理不支持的参数
-        if not (capabilities & ImageCapability.IMAGE_TO_IMAGE) and images_data:
+        if not supports_i2i and (images_data or image_sources):
             logger.warning(
-                f"[ImageGen] 当前适配器不支持参考图，已忽略 {len(images_data)} 张图片"
+                f"[ImageGen] 当前适配器不支持参考图，已忽略 {len(images_data or image_sources)} 张图片"
             )
             images_data = None
+            image_sources = None
 
-        if not (capabilities & ImageCapability.ASPECT_RATIO) and aspect_ratio != "自动":
+        if not supports_ar and aspect_ratio != "自动":
             logger.info(
                 f"[ImageGen] 当前适配器不支持指定比例，已忽略参数: {aspect_ratio}"
             )
             aspect_ratio = "自动"
 
-        if not (capabilities & ImageCapability.RESOLUTION) and resolution != "1K":
+        if not supports_res and resolution != "1K":
             logger.info(
                 f"[ImageGen] 当前适配器不支持指定分辨率，已忽略参数: {resolution}"
             )
             resolution = "1K"
 
         if not task_id:
-            task_id = hashlib.md5(
-                f"{time.time()}{unified_msg_origin}".encode()
-            ).hexdigest()[:8]
+            task_id = self.next_task_id()
 
         final_ar = validate_aspect_ratio(aspect_ratio) or None
         if final_ar == "自动":
             final_ar = None
         final_res = validate_resolution(resolution)
 
-        images: list[ImageData] = []
-        if images_data:
-            for data, mime in images_data:
-                images.append(ImageData(data=data, mime_type=mime))
+        # 参考图只保留在 images 这一个列表中，由 _do_generate_and_send 在生成完成后
+        # 清空，本帧不再持有原始数据，等待并发名额和发送结果期间即可释放
+        images = [
+            ImageData(data=data, mime_type=mime) for data, mime in images_data or ()
+        ]
+        images_data = None
 
-        # 使用信号量控制并发
+        # 使用信号量控制并发（包括参考图下载）
         if self.semaphore is None:
             await self._do_generate_and_send(
-                prompt, unified_msg_origin, images, final_ar, final_res, task_id
+                prompt,
+                unified_msg_origin,
+                images,
+                image_sources,
+                final_ar,
+                final_res,
+                task_id,
             )
             return
 
         async with self.semaphore:
             await self._do_generate_and_send(
-                prompt, unified_msg_origin, images, final_ar, final_res, task_id
+                prompt,
+                unified_msg_origin,
+                images,
+                image_sources,
+                final_ar,
+                final_res,
+                task_id,
             )
 
     async def _do_generate_and_send(
@@ -232,15 +346,30 @@ class ImageGenerationPlugin(Star):
         prompt: str,
         unified_msg_origin: str,
         images: list[ImageData],
+        image_sources: list[tuple[bool, str]] | None,
         aspect_ratio: str | None,
         resolution: str | None,
         task_id: str,
     ) -> None:
-        """执行生成逻辑并发送结果。"""
-        start_time = time.time()
+        """下载参考图，执行生成逻辑并发送结果。
+
+        `images` 由调用方独占传入，生成完成后会被清空以尽早释放参考图数据。
+        """
+        # 已开始执行，不再参与排队淘汰
+        self._pending_generations.pop(task_id, None)
         if not self.generator:
             logger.warning("[ImageGen] 生成器未初始化，跳过生成请求")
             return
+
+        if image_sources:
+            images.extend(
+                ImageData(data=data, mime_type=mime)
+                for data, mime in await self.image_processor.fetch_images(
+                    image_sources
+                )
+            )
+
+        start_ns = time.perf_counter_ns()
         result = await self.generator.generate(
             GenerationRequest(
                 prompt=prompt,
@@ -250,8 +379,10 @@ class ImageGenerationPlugin(Star):
                 task_id=task_id,
             )
         )
-        end_time = time.time()
-        duration = end_time - start_time
+        # 单调高精度计时，不受系统时间调整影响
+        duration = (time.perf_counter_ns() - start_ns) / 1e9
+        # 参考图已不再需要，在保存和发送结果前释放其数据
+        images.clear()
 
         if result.error:
             logger.error(
@@ -263,9 +394,10 @@ class ImageGenerationPlugin(Star):
             )
             return
 
-        logger.info(
-            f"[ImageGen] 任务 {task_id} 生成成功，耗时: {duration:.2f}s, 图片数量: {len(result.images) if result.images else 0}"
-        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                f"[ImageGen] 任务 {task_id} 生成成功，耗时: {duration:.2f}s, 图片数量: {len(result.images) if result.images else 0}"
+            )
 
         if not result.images:
             return
@@ -273,31 +405,36 @@ class ImageGenerationPlugin(Star):
         # 记录使用次数
         self.usage_manager.record_usage(unified_msg_origin)
 
-        chain = MessageChain()
-        for img_bytes in result.images:
-            file_path = self.image_processor.save_generated_image(task_id, img_bytes)
-            if file_path:
-                chain.file_image(file_path)
-
-        info_parts = []
-        if self.config_manager.show_generation_info:
-            info_parts.append(
-                f"✨ 生成成功！\n📊 耗时: {duration:.2f}s\n🖼️ 数量: {len(result.images)}张"
+        # 各图片的写盘相互独立，并发执行
+        file_paths = await asyncio.gather(
+            *(
+                self.image_processor.save_generated_image(task_id, img_bytes)
+                for img_bytes in result.images
             )
+        )
+        saved_paths = [file_path for file_path in file_paths if file_path]
 
-        if self.config_manager.show_model_info and self.config_manager.adapter_config:
-            info_parts.append(
-                f"🤖 模型: {self.config_manager.adapter_config.name}/{self.config_manager.adapter_config.model}"
-            )
+        info_template = self.config_manager.get_info_template(
+            self.usage_manager.is_daily_limit_enabled()
+        )
 
-        if self.usage_manager.is_daily_limit_enabled():
-            count = self.usage_manager.get_usage_count(unified_msg_origin)
-            info_parts.append(
-                f"📅 今日用量: {count}/{self.usage_manager.get_daily_limit()}"
-            )
+        # 图片均保存失败且没有附加信息时，不发送空消息
+        if not saved_paths and not info_template:
+            logger.warning(f"[ImageGen] 任务 {task_id} 的图片均保存失败，未发送结果")
+            return
 
-        if info_parts:
-            chain.message("\n" + "\n".join(info_parts))
+        chain = MessageChain()
+        for file_path in saved_paths:
+            chain.file_image(file_path)
+        if info_template:
+            chain.message(
+                info_template.format(
+                    duration=duration,
+                    n=len(result.images),
+                    count=self.usage_manager.get_usage_count(unified_msg_origin),
+                    limit=self.usage_manager.get_daily_limit(),
+                )
+            )
 
         await self.context.send_message(unified_msg_origin, chain)
 
@@ -315,16 +452,18 @@ class ImageGenerationPlugin(Star):
             yield event.plain_result(check_result)
             return
 
-        masked_uid = mask_sensitive(user_id)
-
         user_input = (event.message_str or "").strip()
-        logger.info(f"[ImageGen] 收到生图指令 - 用户: {masked_uid}, 输入: {user_input}")
+        # 日志级别过滤掉 INFO 时跳过脱敏和字符串格式化
+        if logger.isEnabledFor(logging.INFO):
+            masked_uid = mask_sensitive(user_id)
+            logger.info(
+                f"[ImageGen] 收到生图指令 - 用户: {masked_uid}, 输入: {user_input}"
+            )
 
-        cmd_parts = user_input.split(maxsplit=1)
-        if not cmd_parts:
+        if not user_input:
             return
 
-        prompt = cmd_parts[1].strip() if len(cmd_parts) > 1 else ""
+        prompt, first_token, rest = _split_command(user_input)
         aspect_ratio = self.config_manager.default_aspect_ratio
         resolution = self.config_manager.default_resolution
 
@@ -332,38 +471,25 @@ class ImageGenerationPlugin(Star):
         matched_preset = None
         extra_content = ""
         if prompt:
-            parts = prompt.split(maxsplit=1)
-            first_token = parts[0]
-            rest = parts[1] if len(parts) > 1 else ""
             if first_token in self.config_manager.presets:
                 matched_preset = first_token
-                extra_content = rest
             else:
-                for name in self.config_manager.presets:
-                    if name.lower() == first_token.lower():
-                        matched_preset = name
-                        extra_content = rest
-                        break
+                matched_preset = self.config_manager.presets_ci.get(
+                    first_token.lower()
+                )
+            if matched_preset:
+                extra_content = rest
 
         if matched_preset:
-            logger.info(f"[ImageGen] 命中预设: {matched_preset}")
-            preset_content = self.config_manager.presets[matched_preset]
-            try:
-                # 预设支持 JSON 格式配置高级参数
-                if isinstance(
-                    preset_content, str
-                ) and preset_content.strip().startswith("{"):
-                    preset_data = json.loads(preset_content)
-                    if isinstance(preset_data, dict):
-                        prompt = preset_data.get("prompt", "")
-                        aspect_ratio = preset_data.get("aspect_ratio", aspect_ratio)
-                        resolution = preset_data.get("resolution", resolution)
-                    else:
-                        prompt = preset_content
-                else:
-                    prompt = preset_content
-            except json.JSONDecodeError:
-                prompt = preset_content
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"[ImageGen] 命中预设: {matched_preset}")
+            # 预设在加载时已解析（支持 JSON 格式配置高级参数）
+            preset = self.config_manager.get_preset_entry(matched_preset)
+            prompt = preset.prompt
+            if preset.aspect_ratio is not None:
+                aspect_ratio = preset.aspect_ratio
+            if preset.resolution is not None:
+                resolution = preset.resolution
 
             if extra_content:
                 prompt = f"{prompt} {extra_content}"
@@ -372,50 +498,48 @@ class ImageGenerationPlugin(Star):
             yield event.plain_result("❌ 请提供图片生成的提示词或预设名称！")
             return
 
-        # 获取参考图
-        images_data = None
-        if (
-            self.generator
-            and self.generator.adapter
-            and (
-                self.generator.adapter.get_capabilities()
-                & ImageCapability.IMAGE_TO_IMAGE
-            )
-        ):
-            images_data = await self.image_processor.fetch_images_from_event(event)
+        # 获取参考图：此处只收集图片来源，下载在生图任务获得并发名额后进行
+        image_sources = (
+            self.image_processor.collect_image_sources(event)
+            if self._cap_flags[0]
+            else []
+        )
 
         msg = "已开始生图任务"
-        if images_data:
-            msg += f"[{len(images_data)}张参考图]"
+        if image_sources:
+            msg += f"[{len(image_sources)}张参考图]"
         if matched_preset:
             msg += f"[预设: {matched_preset}]"
         yield event.plain_result(msg)
 
-        task_id = hashlib.md5(f"{time.time()}{user_id}".encode()).hexdigest()[:8]
+        task_id = self.next_task_id()
 
-        self.create_background_task(
+        self.submit_generation_task(
+            task_id,
+            event.unified_msg_origin,
             self._generate_and_send_image_async(
                 prompt=prompt,
-                images_data=images_data or None,
                 unified_msg_origin=event.unified_msg_origin,
                 aspect_ratio=aspect_ratio,
                 resolution=resolution,
                 task_id=task_id,
-            )
+                image_sources=image_sources or None,
+            ),
         )
 
     @filter.command("生图模型")
     async def model_command(self, event: AstrMessageEvent, model_index: str = ""):
         """切换生图模型。"""
-        if not self.config_manager.adapter_config:
+        adapter_config = self.config_manager.adapter_config
+        if not adapter_config:
             yield event.plain_result("❌ 适配器未初始化")
             return
 
-        models = self.config_manager.adapter_config.available_models or []
+        models = adapter_config.available_models or []
 
         if not model_index:
             lines = ["📋 可用模型列表:"]
-            current_model_full = f"{self.config_manager.adapter_config.name}/{self.config_manager.adapter_config.model}"
+            current_model_full = f"{adapter_config.name}/{adapter_config.model}"
             for idx, model in enumerate(models, 1):
                 marker = " ✓" if model == current_model_full else ""
                 lines.append(f"{idx}. {model}{marker}")
@@ -436,6 +560,7 @@ class ImageGenerationPlugin(Star):
                     await self.generator.update_adapter(
                         self.config_manager.adapter_config
                     )
+                    self._refresh_capabilities()
 
                 yield event.plain_result(f"✅ 模型已切换: {raw_model}")
             else:
@@ -447,38 +572,39 @@ class ImageGenerationPlugin(Star):
     async def preset_command(self, event: AstrMessageEvent):
         """管理生图预设。"""
         user_id = event.unified_msg_origin
-        masked_uid = mask_sensitive(user_id)
         message_str = (event.message_str or "").strip()
-        logger.info(
-            f"[ImageGen] 收到预设指令 - 用户: {masked_uid}, 内容: {message_str}"
-        )
+        if logger.isEnabledFor(logging.INFO):
+            masked_uid = mask_sensitive(user_id)
+            logger.info(
+                f"[ImageGen] 收到预设指令 - 用户: {masked_uid}, 内容: {message_str}"
+            )
 
-        parts = message_str.split(maxsplit=1)
-        cmd_text = parts[1].strip() if len(parts) > 1 else ""
+        cmd_text, action, action_arg = _split_command(message_str)
 
         if not cmd_text:
             if not self.config_manager.presets:
                 yield event.plain_result("📋 当前没有预设")
                 return
-            preset_list = ["📋 预设列表:"]
-            for idx, (name, prompt) in enumerate(
-                self.config_manager.presets.items(), 1
-            ):
-                display = prompt[:20] + "..." if len(prompt) > 20 else prompt
-                preset_list.append(f"{idx}. {name}: {display}")
-            yield event.plain_result("\n".join(preset_list))
+            # 每个预设只格式化一次，超过 20 字的内容截断显示
+            preset_lines = "\n".join(
+                f"{idx}. {name}: {prompt[:20]}{'...' if len(prompt) > 20 else ''}"
+                for idx, (name, prompt) in enumerate(
+                    self.config_manager.presets.items(), 1
+                )
+            )
+            yield event.plain_result(f"📋 预设列表:\n{preset_lines}")
             return
 
-        if cmd_text.startswith("添加 "):
-            parts = cmd_text[3:].split(":", 1)
+        if action == "添加":
+            parts = action_arg.split(":", 1)
             if len(parts) == 2:
                 name, prompt = parts
                 self.config_manager.save_preset(name.strip(), prompt.strip())
                 yield event.plain_result(f"✅ 预设已添加: {name.strip()}")
             else:
                 yield event.plain_result("❌ 格式错误: /预设 添加 名称:内容")
-        elif cmd_text.startswith("删除 "):
-            name = cmd_text[3:].strip()
+        elif action == "删除":
+            name = action_arg
             if self.config_manager.delete_preset(name):
                 yield event.plain_result(f"✅ 预设已删除: {name}")
             else: